@@ -13,9 +13,19 @@ import sys
 import time
 import logging
 import traceback
+import functools
+import hashlib
+from collections import OrderedDict
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
 
 # Pin definitions (for environment variables and documentation)
 RST_PIN = int(os.environ.get('EINK_RST_PIN', 17)) if os.environ.get('USE_ALT_EINK_PINS') else 17
@@ -44,6 +54,83 @@ if NVME_COMPATIBLE:
     SCK_PIN = int(os.environ.get('EINK_SCK_PIN', 11))
     USE_SW_SPI = True
 
+# Number of converted 4-gray frame buffers kept for repeated images
+BUFFER_CACHE_SIZE = 8
+
+# Fonts tried in order for text updates
+FONT_PATHS = [
+    '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf',
+    '/usr/share/fonts/TTF/DejaVuSans.ttf',
+    '/usr/share/fonts/dejavu/DejaVuSans.ttf',
+    '/System/Library/Fonts/Helvetica.ttc',
+    'C:\\Windows\\Fonts\\Arial.ttf'
+]
+
+if NUMPY_AVAILABLE:
+    # Two-bit level of every 8-bit gray value: the top two bits, except that
+    # the manufacturer's code moves 0xC0 and 0x80 down one level first
+    _GRAY_LEVELS = (np.arange(256, dtype=np.uint8) & 0xC0) >> 6
+    _GRAY_LEVELS[0xC0] = 2
+    _GRAY_LEVELS[0x80] = 1
+
+def _panel_pixels(image, mode, width, height):
+    """
+    Pixels of an image as a (height, width) array in panel orientation
+    
+    Landscape images (height x width pixels) are rotated onto the panel the
+    same way the manufacturer's getbuffer functions do it. Returns None for
+    any other size, which the manufacturer's code leaves blank.
+    """
+    pixels = np.asarray(image.convert(mode))
+    if pixels.shape == (width, height):
+        return np.rot90(pixels)
+    if pixels.shape == (height, width):
+        return pixels
+    return None
+
+def _pack_1gray(image, width, height):
+    """
+    Vectorized epd3in7.getbuffer(): one bit per pixel, most significant bit
+    first, set for white
+    """
+    pixels = _panel_pixels(image, '1', width, height)
+    if pixels is None:
+        return [0xFF] * (width // 8 * height)
+    return np.packbits(pixels, axis=1).ravel().tolist()
+
+def _pack_4gray(image, width, height):
+    """
+    Vectorized epd3in7.getbuffer_4Gray(): two bits per pixel, four pixels
+    per byte, most significant bits first
+    """
+    pixels = _panel_pixels(image, 'L', width, height)
+    if pixels is None:
+        return [0xFF] * (width // 4 * height)
+    levels = _GRAY_LEVELS[pixels].reshape(height, width // 4, 4)
+    packed = (levels[..., 0] << 6) | (levels[..., 1] << 4) | (levels[..., 2] << 2) | levels[..., 3]
+    return packed.ravel().tolist()
+
+@functools.lru_cache(maxsize=32)
+def _load_font(size):
+    """
+    Load the first available of FONT_PATHS once per size and reuse it for later text updates
+    Args:
+        size: Font size
+    """
+    from PIL import ImageFont
+    
+    for path in FONT_PATHS:
+        if os.path.exists(path):
+            try:
+                font = ImageFont.truetype(path, size)
+                logger.debug("Using font: %s", path)
+                return font
+            except OSError:
+                pass
+    
+    logger.warning("No TrueType fonts found, using default")
+    return ImageFont.load_default()
+
 # Import EInkDeviceInterface at the top of the file
 try:
     from devices.eink.eink import EInkDeviceInterface
@@ -81,7 +168,16 @@ class WaveshareEPD3in7:
         self.busy_timeout = busy_timeout if busy_timeout is not None else int(os.environ.get('EINK_BUSY_TIMEOUT', 10))
         self.epd = None
         self.initialized = False
+        # Mode the panel was last initialized in, None when it needs an init
+        self.mode = None
         self.hardware_type = self._detect_hardware()
+        # Text canvas reused across display_text calls, created on first use
+        self._canvas = None
+        self._draw = None
+        # Converted 4-gray buffers keyed by a digest of the source image
+        self._buffer_cache = OrderedDict()
+        # 4-gray buffer the panel currently shows, None when unknown
+        self._shown_buffer = None
         
         if self.nvme_compatible:
             print("Running in NVME-compatible mode with software SPI")
@@ -195,18 +291,20 @@ class WaveshareEPD3in7:
         Args:
             mode: 0 = 4Gray mode, 1 = 1Gray mode
         """
-        if self.initialized:
+        if self.initialized and mode == self.mode:
             return
             
         try:
             if self.mock_mode:
                 print(f"Mock init with mode={mode}")
                 self.initialized = True
+                self.mode = mode
                 return
                 
             # Call the manufacturer's init method
             self.epd.init(mode)
             self.initialized = True
+            self.mode = mode
             
         except Exception as e:
             error_msg = f"Error initializing display: {e}"
@@ -227,8 +325,7 @@ class WaveshareEPD3in7:
             clear_color: Color to clear with (0xFF = white)
             mode: 0 = 4Gray mode, 1 = 1Gray mode
         """
-        if not self.initialized:
-            self.init(mode)
+        self.init(mode)
             
         try:
             if self.mock_mode:
@@ -236,6 +333,7 @@ class WaveshareEPD3in7:
                 return
                 
             # Call the manufacturer's clear method
+            self._shown_buffer = None
             self.epd.Clear(clear_color, mode)
             
         except Exception as e:
@@ -259,8 +357,7 @@ class WaveshareEPD3in7:
         Args:
             buffer: Display buffer to show
         """
-        if not self.initialized:
-            self.init(0)  # 4-Gray mode
+        self.init(0)  # 4-Gray mode
             
         try:
             if self.mock_mode:
@@ -268,6 +365,7 @@ class WaveshareEPD3in7:
                 return
                 
             # Call the manufacturer's display_4Gray method
+            self._shown_buffer = None
             self.epd.display_4Gray(buffer)
             
         except Exception as e:
@@ -287,8 +385,7 @@ class WaveshareEPD3in7:
         Args:
             buffer: Display buffer to show
         """
-        if not self.initialized:
-            self.init(1)  # 1-Gray mode
+        self.init(1)  # 1-Gray mode
             
         try:
             if self.mock_mode:
@@ -296,6 +393,7 @@ class WaveshareEPD3in7:
                 return
                 
             # Call the manufacturer's display_1Gray method
+            self._shown_buffer = None
             self.epd.display_1Gray(buffer)
             
         except Exception as e:
@@ -316,8 +414,7 @@ class WaveshareEPD3in7:
         Args:
             image: PIL image to display
         """
-        if not self.initialized:
-            self.init(0)  # 4-Gray mode
+        self.init(0)  # 4-Gray mode
             
         try:
             if self.mock_mode:
@@ -326,7 +423,16 @@ class WaveshareEPD3in7:
                 
             # Use the manufacturer's method to convert and display
             buffer = self.getbuffer_4Gray(image)
+            
+            # A refresh takes seconds and flashes the panel, so skip it when
+            # the pixels are the ones already shown
+            if buffer == self._shown_buffer:
+                print("Image unchanged, skipping display refresh")
+                return
+            
+            self._shown_buffer = None
             self.epd.display_4Gray(buffer)
+            self._shown_buffer = buffer
             
         except Exception as e:
             error_msg = f"Error displaying image: {e}"
@@ -350,7 +456,9 @@ class WaveshareEPD3in7:
             return bytearray(int(self.width * self.height / 8))
             
         try:
-            # Use the manufacturer's method
+            # Same buffer as the manufacturer's method, without its per-pixel loop
+            if NUMPY_AVAILABLE:
+                return _pack_1gray(image, self.width, self.height)
             return self.epd.getbuffer(image)
         except Exception as e:
             error_msg = f"Error getting buffer: {e}"
@@ -372,9 +480,20 @@ class WaveshareEPD3in7:
             print("Mock getbuffer_4Gray")
             return bytearray(int(self.width * self.height * 2 / 8))
             
+        # Repainting identical pixels is common (status screens), so reuse the
+        # buffer converted last time instead of running the conversion again
+        key = (image.mode, image.size, hashlib.sha1(image.tobytes()).digest())
+        buffer = self._buffer_cache.get(key)
+        if buffer is not None:
+            self._buffer_cache.move_to_end(key)
+            return buffer
+            
         try:
-            # Use the manufacturer's method
-            return self.epd.getbuffer_4Gray(image)
+            # Same buffer as the manufacturer's method, without its per-pixel loop
+            if NUMPY_AVAILABLE:
+                buffer = _pack_4gray(image, self.width, self.height)
+            else:
+                buffer = self.epd.getbuffer_4Gray(image)
         except Exception as e:
             error_msg = f"Error getting 4Gray buffer: {e}"
             print(error_msg)
@@ -384,9 +503,17 @@ class WaveshareEPD3in7:
                 return bytearray(int(self.width * self.height * 2 / 8))
             else:
                 raise RuntimeError(error_msg)
+        
+        self._buffer_cache[key] = buffer
+        if len(self._buffer_cache) > BUFFER_CACHE_SIZE:
+            self._buffer_cache.popitem(last=False)
+        return buffer
     
     def sleep(self):
         """Put the display to sleep"""
+        # Waking from deep sleep takes a full init
+        self.mode = None
+        
         if self.mock_mode:
             print("Mock sleep")
             return
@@ -403,6 +530,8 @@ class WaveshareEPD3in7:
     
     def close(self):
         """Clean up resources"""
+        _load_font.cache_clear()
+        
         if self.mock_mode:
             print("Mock close")
             return
@@ -424,7 +553,8 @@ class WaveshareEPD3in7:
             if not self.handle_errors:
                 raise RuntimeError(error_msg)
     
-    def display_text(self, text, x=10, y=10, font_size=24, text_color="black", background_color="white"):
+    def display_text(self, text, x=10, y=10, font_size=24, text_color="black", background_color="white",
+                     fast_refresh=False):
         """
         Display text on the screen
         Args:
@@ -434,6 +564,10 @@ class WaveshareEPD3in7:
             font_size: Font size
             text_color: Color of the text (default: "black")
             background_color: Background color (default: "white")
+            fast_refresh: Refresh in 1-gray mode with the fast A2 waveform,
+                which skips the flashing of a full refresh but shows only
+                black and white and leaves some ghosting until the next
+                full refresh (default: False)
         """
         print(f"WaveshareEPD3in7: display_text called with: '{text}', pos=({x},{y}), font={font_size}, colors=({text_color}, {background_color})")
         
@@ -441,7 +575,7 @@ class WaveshareEPD3in7:
             self.init(0)  # 4-Gray mode
             
         try:
-            from PIL import Image, ImageDraw, ImageFont
+            from PIL import Image, ImageDraw
             
             # Convert color strings to RGB tuples for PIL
             def convert_color(color_name):
@@ -463,33 +597,17 @@ class WaveshareEPD3in7:
             bg_color = convert_color(background_color)
             text_fill = convert_color(text_color)
             
-            print(f"Creating image with background color: {bg_color}")
-            # Create a blank image with the specified background color
-            image = Image.new('L', (self.width, self.height), bg_color)
-            draw = ImageDraw.Draw(image)
-            
-            # Try to find a suitable font
-            font = None
-            font_paths = [
-                '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf',
-                '/usr/share/fonts/TTF/DejaVuSans.ttf',
-                '/usr/share/fonts/dejavu/DejaVuSans.ttf',
-                '/System/Library/Fonts/Helvetica.ttc',
-                'C:\\Windows\\Fonts\\Arial.ttf'
-            ]
-            
-            for path in font_paths:
-                if os.path.exists(path):
-                    try:
-                        font = ImageFont.truetype(path, font_size)
-                        print(f"Using font: {path}")
-                        break
-                    except Exception:
-                        pass
+            # Reuse one canvas and clear it to the background color
+            if self._canvas is None:
+                self._canvas = Image.new('L', (self.width, self.height), bg_color)
+                self._draw = ImageDraw.Draw(self._canvas)
+            else:
+                print(f"Clearing canvas to background color: {bg_color}")
+                self._draw.rectangle([(0, 0), (self.width, self.height)], fill=bg_color)
+            image = self._canvas
+            draw = self._draw
             
-            if font is None:
-                print("No TrueType fonts found, using default")
-                font = ImageFont.load_default()
+            font = _load_font(font_size)
             
             # Draw text with the specified color
             print(f"Drawing text with color: {text_fill}")
@@ -497,7 +615,10 @@ class WaveshareEPD3in7:
             
             # Display the image
             print("Sending image to display")
-            self.display(image)
+            if fast_refresh:
+                self.display_1Gray(self.getbuffer(image))
+            else:
+                self.display(image)
             print("Image sent to display successfully")
             
         except Exception as e:
@@ -635,10 +756,11 @@ class Driver(EInkDeviceInterface):
         print("Driver.close() called")
         self.epd.close()
         
-    def display_text(self, text, x=10, y=10, font_size=24, text_color="black", background_color="white"):
+    def display_text(self, text, x=10, y=10, font_size=24, text_color="black", background_color="white",
+                     fast_refresh=False):
         """Display text on the e-ink screen."""
         print(f"Driver.display_text() called with: '{text}', pos=({x},{y}), font={font_size}, colors=({text_color}, {background_color})")
-        self.epd.display_text(text, x, y, font_size, text_color, background_color)
+        self.epd.display_text(text, x, y, font_size, text_color, background_color, fast_refresh)
 
     def display_file(self, file_path, resize=True):
         """Display an image from a file path on the e-ink screen.
@@ -12,10 +12,39 @@ import sys
 import time
 import logging
 import traceback
+import functools
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 
+# Fonts tried in order for display_text
+FONT_PATHS = [
+    '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf',
+    '/usr/share/fonts/TTF/DejaVuSans.ttf',
+    '/usr/share/fonts/dejavu/DejaVuSans.ttf',
+    '/System/Library/Fonts/Helvetica.ttc',
+    'C:\\Windows\\Fonts\\Arial.ttf'
+]
+
+@functools.lru_cache(maxsize=32)
+def _load_font(size):
+    """
+    Load the first available of FONT_PATHS once per size
+    Args:
+        size: Font size
+    """
+    from PIL import ImageFont
+    
+    for path in FONT_PATHS:
+        if os.path.exists(path):
+            try:
+                return ImageFont.truetype(path, size)
+            except Exception:
+                pass
+    
+    print("No TrueType fonts found, using default")
+    return ImageFont.load_default()
+
 class WaveshareWrapper:
     """
     Wrapper for Waveshare E-Ink display drivers
@@ -322,33 +351,14 @@ class WaveshareWrapper:
             self.init(0)  # 4-Gray mode
             
         try:
-            from PIL import Image, ImageDraw, ImageFont
+            from PIL import Image, ImageDraw
             
             # Create a blank image with white background
             image = Image.new('L', (self.width, self.height), 255)
             draw = ImageDraw.Draw(image)
             
-            # Try to find a suitable font
-            font = None
-            font_paths = [
-                '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf',
-                '/usr/share/fonts/TTF/DejaVuSans.ttf',
-                '/usr/share/fonts/dejavu/DejaVuSans.ttf',
-                '/System/Library/Fonts/Helvetica.ttc',
-                'C:\\Windows\\Fonts\\Arial.ttf'
-            ]
-            
-            for path in font_paths:
-                if os.path.exists(path):
-                    try:
-                        font = ImageFont.truetype(path, font_size)
-                        break
-                    except Exception:
-                        pass
-            
-            if font is None:
-                print("No TrueType fonts found, using default")
-                font = ImageFont.load_default()
+            # Fonts are parsed once per size and reused
+            font = _load_font(font_size)
             
             # Draw text
             draw.text((x, y), text, font=font, fill=0)
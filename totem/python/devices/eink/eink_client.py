@@ -12,17 +12,16 @@ import json
 import socket
 import time
 import logging
-import base64
-from io import BytesIO
+import secrets
 from pathlib import Path
+from multiprocessing import shared_memory
 from PIL import Image
 from typing import Dict, Any, Union, Optional
 import stat
 
 # Add the parent directory to path to import from the project
 script_dir = os.path.dirname(os.path.abspath(__file__))
-devices_dir = os.path.dirname(os.path.dirname(script_dir))
-python_dir = os.path.dirname(devices_dir)
+python_dir = os.path.dirname(os.path.dirname(script_dir))
 sys.path.insert(0, python_dir)
 
 try:
@@ -35,6 +34,11 @@ except ImportError:
     )
     logger = logging.getLogger("eink_client")
 
+from devices.eink.eink_protocol import (
+    encode_command_frame, encode_frame, image_frame_buffers, json_dumps, json_loads,
+    recv_frame, send_buffers
+)
+
 # Constants
 DEFAULT_SOCKET_PATH = "/tmp/eink_service.sock"
 DEFAULT_TCP_HOST = "127.0.0.1"
@@ -43,7 +47,7 @@ DEFAULT_TCP_PORT = 9500
 # Timeout values
 CONNECT_TIMEOUT = 5.0  # seconds
 SEND_TIMEOUT = 10.0    # seconds
-RECV_TIMEOUT = 10.0    # seconds
+RECV_TIMEOUT = 30.0    # seconds, covers waiting for the display to refresh
 
 # Max retries
 MAX_RETRIES = 3
@@ -100,6 +104,7 @@ class EInkClient:
             try:
                 if self.use_tcp:
                     sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+                    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
                     sock.settimeout(self.timeout)
                     sock.connect((self.tcp_host, self.tcp_port))
                 else:
@@ -147,7 +152,7 @@ class EInkClient:
             if not self.use_tcp:
                 if os.path.exists(self.socket_path):
                     diagnostics["socket_exists"] = True
-                    logger.info(f"Socket file exists: {self.socket_path}")
+                    logger.info("Socket file exists: %s", self.socket_path)
                     
                     # Check socket file permissions
                     try:
@@ -158,38 +163,38 @@ class EInkClient:
                             "uid": stat_info.st_uid,
                             "gid": stat_info.st_gid
                         }
-                        logger.info(f"Socket permissions: mode={oct(mode)}, uid={stat_info.st_uid}, gid={stat_info.st_gid}")
+                        logger.info("Socket permissions: mode=%s, uid=%s, gid=%s", oct(mode), stat_info.st_uid, stat_info.st_gid)
                         
                         # Check if it's actually a socket
                         is_socket = stat.S_ISSOCK(mode)
                         diagnostics["socket_is_socket"] = is_socket
                         if is_socket:
-                            logger.info(f"File is a socket: {self.socket_path}")
+                            logger.info("File is a socket: %s", self.socket_path)
                         else:
-                            logger.error(f"File is NOT a socket: {self.socket_path}")
+                            logger.error("File is NOT a socket: %s", self.socket_path)
                             diagnostics["errors"].append(f"File exists but is not a socket: {self.socket_path}")
                     except Exception as e:
-                        logger.error(f"Error checking socket file: {e}")
+                        logger.error("Error checking socket file: %s", e)
                         diagnostics["errors"].append(f"Error checking socket file: {str(e)}")
                 else:
-                    logger.error(f"Socket file not found: {self.socket_path}")
+                    logger.error("Socket file not found: %s", self.socket_path)
                     diagnostics["errors"].append(f"Socket file not found: {self.socket_path}")
                     
                     # Check socket directory
                     socket_dir = os.path.dirname(self.socket_path)
                     if os.path.exists(socket_dir):
-                        logger.info(f"Socket directory exists: {socket_dir}")
+                        logger.info("Socket directory exists: %s", socket_dir)
                         
                         # Check directory permissions
                         try:
                             dir_stat = os.stat(socket_dir)
-                            logger.info(f"Socket directory permissions: {oct(dir_stat.st_mode)}")
-                            logger.info(f"Socket directory owner: uid={dir_stat.st_uid}, gid={dir_stat.st_gid}")
+                            logger.info("Socket directory permissions: %s", oct(dir_stat.st_mode))
+                            logger.info("Socket directory owner: uid=%s, gid=%s", dir_stat.st_uid, dir_stat.st_gid)
                         except Exception as e:
-                            logger.error(f"Error checking socket directory: {e}")
+                            logger.error("Error checking socket directory: %s", e)
                             diagnostics["errors"].append(f"Error checking socket directory: {str(e)}")
                     else:
-                        logger.error(f"Socket directory does not exist: {socket_dir}")
+                        logger.error("Socket directory does not exist: %s", socket_dir)
                         diagnostics["errors"].append(f"Socket directory does not exist: {socket_dir}")
             
             # Try to connect to the service
@@ -202,28 +207,29 @@ class EInkClient:
                 try:
                     status = self.get_status()
                     diagnostics["service_status"] = status
-                    logger.info(f"Service status: {status}")
+                    logger.info("Service status: %s", status)
                 except Exception as e:
-                    logger.error(f"Error getting service status: {e}")
+                    logger.error("Error getting service status: %s", e)
                     diagnostics["errors"].append(f"Error getting service status: {str(e)}")
                 
                 sock.close()
             except EInkClientError as e:
-                logger.error(f"Connection failed: {e}")
+                logger.error("Connection failed: %s", e)
                 diagnostics["errors"].append(f"Connection failed: {str(e)}")
         except Exception as e:
-            logger.error(f"Error during diagnostics: {e}")
+            logger.error("Error during diagnostics: %s", e)
             diagnostics["errors"].append(f"Error during diagnostics: {str(e)}")
         
         logger.info("EInkClient diagnostics completed")
         return diagnostics
     
-    def _send_command(self, command: Dict[str, Any]) -> Dict[str, Any]:
+    def _send_command(self, command: Dict[str, Any], image_data: Optional[bytes] = None) -> Dict[str, Any]:
         """
         Send a command to the EInk service and get the response
         
         Args:
             command: Command dictionary to send
+            image_data: Image bytes to send in an image frame, with the command as its header
             
         Returns:
             dict: Response from the service
@@ -239,34 +245,26 @@ class EInkClient:
             # Set timeout for sending/receiving
             sock.settimeout(SEND_TIMEOUT)
             
-            # Serialize and send the command
-            message = json.dumps(command).encode('utf-8')
-            sock.sendall(message)
+            # Serialize and send the command as a single frame; image bytes
+            # go out straight from the caller's buffer and simple commands
+            # use the compact binary form instead of JSON
+            if image_data is not None:
+                send_buffers(sock, image_frame_buffers(command, image_data))
+            else:
+                frame = encode_command_frame(command)
+                if frame is None:
+                    frame = encode_frame(json_dumps(command))
+                sock.sendall(frame)
             
             # Set timeout for receiving
             sock.settimeout(RECV_TIMEOUT)
             
-            # Receive response
-            response_data = b''
-            while True:
-                chunk = sock.recv(4096)
-                if not chunk:
-                    break
-                response_data += chunk
-                
-                # Check if response is complete (this is a simple approach)
-                try:
-                    json.loads(response_data.decode('utf-8'))
-                    break  # If we can parse it, we have a complete response
-                except json.JSONDecodeError:
-                    # Incomplete JSON, continue receiving
-                    continue
-            
-            # Parse response
-            response = json.loads(response_data.decode('utf-8'))
+            # Receive and parse the framed response in one go
+            _, payload = recv_frame(sock)
+            response = json_loads(payload)
             return response
             
-        except (socket.error, OSError, json.JSONDecodeError) as e:
+        except (socket.error, OSError, ValueError) as e:
             raise EInkClientError(f"Communication error: {e}")
         finally:
             # Clean up
@@ -286,7 +284,7 @@ class EInkClient:
         command = {'action': 'clear'}
         return self._send_command(command)
     
-    def display_text(self, text: str, x: int = 10, y: int = 10, font_size: int = 24, font: Optional[str] = None, text_color: str = "black", background_color: str = "white") -> Dict[str, Any]:
+    def display_text(self, text: str, x: int = 10, y: int = 10, font_size: int = 24, font: Optional[str] = None, text_color: str = "black", background_color: str = "white", fast_refresh: bool = False) -> Dict[str, Any]:
         """
         Display text on the e-ink display
         
@@ -298,6 +296,8 @@ class EInkClient:
             font: Path to font file (optional)
             text_color: Color of the text (default: "black")
             background_color: Background color (default: "white")
+            fast_refresh: Use the panel's fast black-and-white refresh, which
+                does not flash but leaves some ghosting (default: False)
             
         Returns:
             dict: Response from the service
@@ -315,10 +315,13 @@ class EInkClient:
         # Add font if provided
         if font:
             command['font'] = font
+        if fast_refresh:
+            command['fast_refresh'] = True
             
         return self._send_command(command)
     
-    def display_image(self, image=None, image_path=None, force_full_refresh=False) -> Dict[str, Any]:
+    def display_image(self, image=None, image_path=None, force_full_refresh=False,
+                      use_shared_memory=False) -> Dict[str, Any]:
         """
         Display an image on the e-ink display
         
@@ -326,6 +329,9 @@ class EInkClient:
             image: PIL Image object (optional)
             image_path: Path to image file (optional)
             force_full_refresh: Force a full refresh regardless of the counter (optional)
+            use_shared_memory: Hand the pixels of `image` over in a shared memory
+                segment instead of sending them over the socket; the service
+                must run on the same host (optional)
             
         Returns:
             dict: Response from the service
@@ -346,29 +352,60 @@ class EInkClient:
             command['force_full_refresh'] = True
         
         if image_path:
-            # Read image file
+            # Send the file as-is; the service decodes it
             with open(image_path, 'rb') as f:
                 image_data = f.read()
             
-            # Encode as base64
-            image_b64 = base64.b64encode(image_data).decode('utf-8')
-            
-            # Add to command
-            command['image_data'] = image_b64
             command['image_format'] = Path(image_path).suffix[1:].lower()  # Get format from extension (e.g., "png", "jpg")
         else:
-            # Convert PIL Image to bytes
-            buffer = BytesIO()
-            image.save(buffer, format='PNG')
-            image_data = buffer.getvalue()
+            # Send raw pixels so the service can load them without decoding
+            if image.mode not in ('1', 'L', 'RGB'):
+                image = image.convert('RGB')
+            image_data = image.tobytes()
             
-            # Encode as base64
-            image_b64 = base64.b64encode(image_data).decode('utf-8')
+            command['mode'] = image.mode
+            command['width'], command['height'] = image.size
             
-            # Add to command
-            command['image_data'] = image_b64
-            command['image_format'] = 'png'
+            if use_shared_memory:
+                return self._send_shared_image(command, image_data)
+        
+        return self._send_command(command, image_data)
+    
+    def _send_shared_image(self, command: Dict[str, Any], image_data: bytes) -> Dict[str, Any]:
+        """
+        Send an image command whose pixels are passed in shared memory
+        
+        The service only reads segments named eink_<hex> and owned by the
+        connecting user, and copies the pixels out as soon as the command
+        arrives, so the segment is unlinked once the response is back.
+        """
+        shm = shared_memory.SharedMemory(name=f'eink_{secrets.token_hex(8)}', create=True, size=len(image_data))
+        try:
+            shm.buf[:len(image_data)] = image_data
+            command = dict(command, action='display_image_shm', shm_name=shm.name, size=len(image_data))
+            return self._send_command(command)
+        finally:
+            shm.close()
+            shm.unlink()
+    
+    def display_file(self, path: str, force_full_refresh: bool = False) -> Dict[str, Any]:
+        """
+        Display an image file the service reads itself
         
+        Only the path is sent; the service reads the file instead of receiving
+        it over the socket. It must run on the same host and accept files from
+        the file's directory (EINK_IMAGE_DIRS).
+        
+        Args:
+            path: Path to the image file
+            force_full_refresh: Force a full refresh regardless of the counter (optional)
+            
+        Returns:
+            dict: Response from the service
+        """
+        command = {'action': 'display_file', 'path': os.path.abspath(path)}
+        if force_full_refresh:
+            command['force_full_refresh'] = True
         return self._send_command(command)
     
     def sleep(self) -> Dict[str, Any]:
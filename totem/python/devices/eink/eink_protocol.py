@@ -0,0 +1,378 @@
+"""
+EInk Protocol - Message framing and JSON encoding shared by the EInk service and client
+
+Each message on the socket is a 5-byte header - a message type byte and a
+4-byte big-endian payload length - followed by exactly that many payload
+bytes. The receiver reads the header, then the payload, and parses it once.
+
+Message types:
+    MSG_JSON   - the payload is a JSON command or response
+    MSG_IMAGE  - the payload is a 4-byte big-endian length, a JSON header
+                 of that length describing the image, and the image bytes.
+                 The image bytes are either raw pixels (the header carries
+                 'mode', 'width' and 'height') or an encoded image file (the
+                 header carries 'image_format'), so images skip base64.
+    MSG_COMMAND - the payload is a one-byte opcode for a parameter-free
+                 command (status, clear, sleep, wake) or for display_text,
+                 whose x, y and font size follow as 16-bit big-endian
+                 integers and the UTF-8 text fills the rest. Frequent
+                 commands skip JSON this way; responses are always JSON.
+
+A framed connection carries any number of requests, each answered with one
+response frame in request order; the service keeps reading until the client
+shuts down its sending side (or stays idle for the service's client timeout).
+
+Older clients send bare JSON without a header. Message types never take a
+value that a JSON text can start with (RESERVED_MSG_TYPES), and the first
+length byte of a header is at most 1 given MAX_FRAME_SIZE, which is neither
+JSON whitespace nor a valid JSON start. The service therefore tells the two
+apart from the first byte that is not JSON whitespace.
+"""
+
+import json
+import struct
+from typing import Optional
+
+try:
+    import orjson
+    HAS_ORJSON = True
+except ImportError:
+    HAS_ORJSON = False
+
+# Message type byte followed by the 4-byte big-endian payload length
+FRAME_HEADER = struct.Struct('>BI')
+
+# Length of the JSON header at the start of an image payload
+IMAGE_HEADER = struct.Struct('>I')
+
+# Message types
+MSG_JSON = 1
+MSG_IMAGE = 2
+MSG_COMMAND = 3
+
+# Opcodes of MSG_COMMAND frames
+OP_STATUS = 1
+OP_CLEAR = 2
+OP_SLEEP = 3
+OP_WAKE = 4
+OP_DISPLAY_TEXT = 5
+
+COMMAND_OPCODES = {
+    'status': OP_STATUS,
+    'clear': OP_CLEAR,
+    'sleep': OP_SLEEP,
+    'wake': OP_WAKE,
+    'display_text': OP_DISPLAY_TEXT,
+}
+_OPCODE_ACTIONS = {op: action for action, op in COMMAND_OPCODES.items()}
+
+# Opcode, x, y and font size at the start of a display_text command
+TEXT_COMMAND = struct.Struct('>BHHH')
+
+# display_text fields the compact form leaves out, with the values it implies
+_TEXT_DEFAULTS = {'text_color': 'black', 'background_color': 'white'}
+
+# Largest payload accepted in a single frame
+MAX_FRAME_SIZE = 16 * 1024 * 1024
+
+# Standard library codec used when orjson is not installed, created once
+# rather than per call; compact separators match orjson's output
+_JSON_ENCODER = json.JSONEncoder(separators=(',', ':'))
+_JSON_SORTED_ENCODER = json.JSONEncoder(separators=(',', ':'), sort_keys=True)
+_JSON_DECODER = json.JSONDecoder()
+
+# Whitespace a JSON text may start with
+JSON_WHITESPACE = b' \t\r\n'
+
+# First bytes that identify an unframed (legacy) JSON message: anything a
+# JSON text can start with
+LEGACY_JSON_START = b'{["-0123456789tfn' + JSON_WHITESPACE
+
+# Message type values that would be mistaken for the start of bare JSON
+RESERVED_MSG_TYPES = frozenset(LEGACY_JSON_START)
+
+
+def encode_frame(payload: bytes, msg_type: int = MSG_JSON) -> bytes:
+    """
+    Prefix a payload with its frame header
+
+    Args:
+        payload: Encoded message body
+        msg_type: Message type (MSG_JSON, MSG_IMAGE or MSG_COMMAND)
+
+    Returns:
+        bytes: Header followed by the payload
+
+    Raises:
+        ValueError: If msg_type is one of RESERVED_MSG_TYPES
+    """
+    if msg_type in RESERVED_MSG_TYPES:
+        raise ValueError(f"Message type {msg_type} is reserved")
+    return FRAME_HEADER.pack(msg_type, len(payload)) + payload
+
+
+def encode_image_frame(header: dict, data: bytes) -> bytes:
+    """
+    Build an image frame from a JSON header and the image bytes
+
+    Args:
+        header: Command fields and a description of the image
+        data: Raw pixels or an encoded image file
+
+    Returns:
+        bytes: The complete frame
+    """
+    return b''.join(image_frame_buffers(header, data))
+
+
+def encode_command_frame(command: dict):
+    """
+    Encode a command as a compact MSG_COMMAND frame if it has that form
+
+    Args:
+        command: Command dictionary with an 'action' key
+
+    Returns:
+        bytes: The complete frame, or None if the command carries fields the
+        compact form cannot express and has to be sent as JSON
+    """
+    op = COMMAND_OPCODES.get(command.get('action'))
+    if op is None:
+        return None
+    if op != OP_DISPLAY_TEXT:
+        if len(command) > 1:
+            return None
+        return FRAME_HEADER.pack(MSG_COMMAND, 1) + bytes((op,))
+
+    for key, value in command.items():
+        if key not in ('action', 'text', 'x', 'y', 'font_size') and _TEXT_DEFAULTS.get(key) != value:
+            return None
+    params = (command.get('x', 10), command.get('y', 10), command.get('font_size', 24))
+    text = command.get('text', '')
+    if not isinstance(text, str) or not all(type(v) is int and 0 <= v <= 0xFFFF for v in params):
+        return None
+    payload = TEXT_COMMAND.pack(op, *params) + text.encode('utf-8')
+    return FRAME_HEADER.pack(MSG_COMMAND, len(payload)) + payload
+
+
+def decode_command_payload(payload) -> dict:
+    """
+    Turn the payload of a MSG_COMMAND frame back into a command dictionary
+
+    Args:
+        payload: Payload of a MSG_COMMAND frame
+
+    Returns:
+        dict: The command, as it would have been sent in JSON
+
+    Raises:
+        ValueError: If the opcode is unknown or the payload is truncated
+    """
+    if not len(payload) or payload[0] not in _OPCODE_ACTIONS:
+        raise ValueError(f"Unknown command opcode: {bytes(payload[:1])!r}")
+    action = _OPCODE_ACTIONS[payload[0]]
+    if action != 'display_text':
+        return {'action': action}
+    if len(payload) < TEXT_COMMAND.size:
+        raise ValueError(f"Truncated display_text command of {len(payload)} bytes")
+    _, x, y, font_size = TEXT_COMMAND.unpack_from(payload)
+    return {
+        'action': action,
+        'text': str(payload[TEXT_COMMAND.size:], 'utf-8'),
+        'x': x,
+        'y': y,
+        'font_size': font_size,
+    }
+
+
+def image_frame_buffers(header: dict, data) -> list:
+    """
+    Build an image frame as a list of buffers, without copying the image
+
+    Only the headers are joined; the image bytes are passed through as-is,
+    so send_buffers() can hand the frame to the kernel in one sendmsg().
+
+    Args:
+        header: Command fields and a description of the image
+        data: Raw pixels or an encoded image file
+
+    Returns:
+        list: The frame and image headers followed by the image bytes
+    """
+    header_bytes = json_dumps(header)
+    size = IMAGE_HEADER.size + len(header_bytes) + len(data)
+    return [
+        FRAME_HEADER.pack(MSG_IMAGE, size) + IMAGE_HEADER.pack(len(header_bytes)) + header_bytes,
+        data,
+    ]
+
+
+def send_buffers(sock, buffers) -> None:
+    """
+    Send a list of buffers completely using scatter-gather sendmsg() calls
+
+    Args:
+        sock: Connected blocking socket
+        buffers: Bytes-like objects to send in order
+    """
+    views = [memoryview(buf).cast('B') for buf in buffers]
+    while views:
+        sent = sock.sendmsg(views)
+        while views and sent >= len(views[0]):
+            sent -= len(views[0])
+            views.pop(0)
+        if sent:
+            views[0] = views[0][sent:]
+
+
+def decode_image_payload(payload):
+    """
+    Split an image frame payload into its header and image bytes
+
+    Args:
+        payload: Payload of a MSG_IMAGE frame
+
+    Returns:
+        Tuple of (header, data) with data as a memoryview into the payload
+
+    Raises:
+        ValueError: If the header length is inconsistent with the payload
+    """
+    view = memoryview(payload)
+    if len(view) < IMAGE_HEADER.size:
+        raise ValueError(f"Image payload of {len(view)} bytes is too short for its header length")
+    (header_size,) = IMAGE_HEADER.unpack_from(view)
+    header_end = IMAGE_HEADER.size + header_size
+    if header_end > len(view):
+        raise ValueError(f"Image header of {header_size} bytes exceeds payload of {len(view)} bytes")
+    return json_loads(bytes(view[IMAGE_HEADER.size:header_end])), view[header_end:]
+
+
+def json_dumps(obj, sort_keys: bool = False) -> bytes:
+    """
+    Serialize an object to UTF-8 encoded JSON
+
+    Uses orjson when it is installed and the standard library otherwise.
+
+    Args:
+        obj: Object to serialize
+        sort_keys: Write object keys in sorted order, so equal objects
+            always encode to the same bytes
+
+    Returns:
+        bytes: The encoded JSON document
+    """
+    if HAS_ORJSON:
+        return orjson.dumps(obj, option=orjson.OPT_SORT_KEYS) if sort_keys else orjson.dumps(obj)
+    encoder = _JSON_SORTED_ENCODER if sort_keys else _JSON_ENCODER
+    return encoder.encode(obj).encode('utf-8')
+
+
+def json_loads(data):
+    """
+    Parse a JSON document from bytes, bytearray, memoryview or str
+
+    Uses orjson when it is installed and the standard library otherwise.
+    Both raise a ValueError subclass (json.JSONDecodeError or
+    UnicodeDecodeError) on invalid input.
+
+    Args:
+        data: Encoded JSON document
+    """
+    if HAS_ORJSON:
+        return orjson.loads(data)
+    if not isinstance(data, str):
+        data = str(data, 'utf-8')
+    return _JSON_DECODER.decode(data)
+
+
+def is_legacy_message(data: bytes) -> Optional[bool]:
+    """
+    Check whether a message starts like bare JSON rather than a frame header
+
+    Leading JSON whitespace is skipped, so a frame with a reserved whitespace
+    type byte is still recognised by the length byte that follows it and can
+    be rejected as a frame.
+
+    Args:
+        data: The bytes received from the peer so far
+
+    Returns:
+        True for bare JSON, False for a frame header, or None while nothing
+        but whitespace has arrived
+    """
+    start = bytes(data).lstrip(JSON_WHITESPACE)[:1]
+    if not start:
+        return None
+    return start in LEGACY_JSON_START
+
+
+def split_frame(buf):
+    """
+    Take one complete frame from the start of a receive buffer
+
+    Args:
+        buf: Bytes received so far
+
+    Returns:
+        Tuple of (msg_type, payload, end) with the payload as a memoryview
+        into buf and end the offset just past the frame, or None if the
+        frame is not complete yet
+
+    Raises:
+        ValueError: If the announced payload exceeds MAX_FRAME_SIZE
+    """
+    if len(buf) < FRAME_HEADER.size:
+        return None
+    msg_type, size = FRAME_HEADER.unpack_from(buf)
+    if size > MAX_FRAME_SIZE:
+        raise ValueError(f"Frame of {size} bytes exceeds limit of {MAX_FRAME_SIZE} bytes")
+    end = FRAME_HEADER.size + size
+    if len(buf) < end:
+        return None
+    return msg_type, memoryview(buf)[FRAME_HEADER.size:end], end
+
+
+def recv_exact(sock, size: int) -> bytearray:
+    """
+    Read exactly `size` bytes from a socket
+
+    Args:
+        sock: Connected socket
+        size: Number of bytes to read
+
+    Returns:
+        bytearray: The received bytes
+
+    Raises:
+        ConnectionError: If the peer closes the connection early
+    """
+    buf = bytearray(size)
+    view = memoryview(buf)
+    pos = 0
+    while pos < size:
+        received = sock.recv_into(view[pos:])
+        if not received:
+            raise ConnectionError(f"Connection closed after {pos} of {size} bytes")
+        pos += received
+    return buf
+
+
+def recv_frame(sock):
+    """
+    Read one frame from a socket
+
+    Args:
+        sock: Connected socket
+
+    Returns:
+        Tuple of (msg_type, payload) with the payload as a bytearray
+
+    Raises:
+        ConnectionError: If the peer closes the connection early
+        ValueError: If the announced payload exceeds MAX_FRAME_SIZE
+    """
+    msg_type, size = FRAME_HEADER.unpack(recv_exact(sock, FRAME_HEADER.size))
+    if size > MAX_FRAME_SIZE:
+        raise ValueError(f"Frame of {size} bytes exceeds limit of {MAX_FRAME_SIZE} bytes")
+    return msg_type, recv_exact(sock, size)
@@ -8,27 +8,30 @@ and provides a socket-based API for other processes to send display commands.
 import os
 import sys
 import time
+import argparse
 import json
 import socket
 import signal
+import atexit
 import threading
 import queue
 import base64
-import traceback
 from pathlib import Path
 import logging
-import subprocess
-import select
-from io import BytesIO
-from PIL import Image, ImageDraw, ImageFont, ImageOps
+import selectors
 from typing import Dict, Any, Optional, List, Tuple, Union
 import errno
 import stat
+import struct
+import re
+import hashlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
 
 # Add the parent directory to path to import from the project
 script_dir = os.path.dirname(os.path.abspath(__file__))
-devices_dir = os.path.dirname(os.path.dirname(script_dir))
-python_dir = os.path.dirname(devices_dir)
+python_dir = os.path.dirname(os.path.dirname(script_dir))
 sys.path.insert(0, python_dir)
 
 # Define log file path
@@ -58,7 +61,7 @@ except ImportError:
             ]
         )
         logger = logging.getLogger("eink_service")
-        logger.info(f"Logger initialized with log file at {LOG_FILE_PATH}")
+        logger.info("Logger initialized with log file at %s", LOG_FILE_PATH)
     except Exception as e:
         # If we can't write to the log file, fall back to console only
         print(f"Error setting up log file at {LOG_FILE_PATH}: {e}")
@@ -70,18 +73,17 @@ except ImportError:
             ]
         )
         logger = logging.getLogger("eink_service")
-        logger.error(f"Failed to set up log file at {LOG_FILE_PATH}: {e}")
+        logger.error("Failed to set up log file at %s: %s", LOG_FILE_PATH, e)
         logger.info("Falling back to console logging only")
 
-# Try to import the proper EInk driver classes
+# The hardware driver (and NumPy, which it packs frames with) is only
+# imported when the hardware display is initialized, so mock mode and
+# processes that merely import this module do not pay for it
 try:
-    # Import directly from drivers subdirectory
-    from devices.eink.drivers.waveshare_3in7 import WaveshareEPD3in7
     from devices.eink.mock_epd import MockEPD
-    logger.info("Successfully imported device drivers")
 except ImportError:
-    logger.error("Failed to import device drivers")
-    # Create placeholder classes to avoid errors
+    logger.error("Failed to import mock display driver")
+    # Create a placeholder class to avoid errors
     class MockEPD:
         def __init__(self):
             pass
@@ -95,29 +97,176 @@ except ImportError:
             pass
         def sleep(self):
             pass
-        def display_text(self, text, x=10, y=10, font_size=24):
+        def display_text(self, text, x=10, y=10, font_size=24, text_color="black", background_color="white",
+                         fast_refresh=False):
             pass
-    
-    class WaveshareEPD3in7(MockEPD):
-        pass
 
-# Try to import EInk class for higher-level abstraction
-try:
-    from devices.eink.eink import EInk
-    logger.info("Successfully imported EInk class")
-    HAS_EINK_CLASS = True
-except ImportError:
-    logger.warning("Could not import EInk class, using direct driver access")
-    HAS_EINK_CLASS = False
+from devices.eink.eink_protocol import (
+    MAX_FRAME_SIZE, MSG_COMMAND, MSG_IMAGE, MSG_JSON, decode_command_payload,
+    decode_image_payload, encode_frame, is_legacy_message, json_dumps, json_loads, split_frame
+)
 
 # Constants
 DEFAULT_SOCKET_PATH = "/tmp/eink_service.sock"
 DEFAULT_TCP_HOST = "127.0.0.1"
-DEFAULT_TCP_PORT = 8797
-INACTIVITY_TIMEOUT = 300  # 5 minutes
+DEFAULT_TCP_PORT = 9500
+GPIO_CHIP_PATH = "/dev/gpiochip0"
+GPIO_SCAN_TTL = 0.5  # seconds a scan for GPIO users is reused during startup
+GPIO_RELEASE_TIMEOUT = 1.0  # seconds killed processes get to release the GPIO chip
+GPIO_RELEASE_POLL = 0.05  # seconds between scans while waiting for that
 MAX_RETRIES = 3  # Maximum number of retries for initialization
 MAX_MSG_SIZE = 65536
-RETRY_DELAY = 2  # seconds
+CLIENT_TIMEOUT = 5.0  # seconds a client gets to send its (next) complete request
+RETRY_DELAY = 2  # seconds, longest wait between initialization attempts
+INITIAL_RETRY_DELAY = 0.1  # seconds before the first retry, doubled after each failure
+MAX_PENDING_BYTES = 1024 * 1024  # Unsent reply data allowed per client
+MAX_QUEUED_COMMANDS = 64  # Commands waiting for the display before clients are told it is busy
+LISTEN_BACKLOG = 128  # Connections the kernel holds while the server loop is busy
+KEEPALIVE_IDLE = 30  # seconds a TCP client may stay silent before it is probed
+KEEPALIVE_INTERVAL = 10  # seconds between unanswered probes
+KEEPALIVE_COUNT = 3  # unanswered probes before the connection is dropped
+IOV_MAX = 1024  # Most buffers passed to a single sendmsg() call
+REALTIME_PRIORITY = 10  # SCHED_FIFO priority used when EINK_RT=1
+SHM_DIR = "/dev/shm"  # Where POSIX shared memory segments appear on Linux
+# Names EInkClient gives its shared memory segments; nothing else in
+# /dev/shm is read
+_SHM_NAME = re.compile(r'^/?eink_[0-9a-f]+$')
+# pid, uid and gid of a Unix socket peer, as returned by SO_PEERCRED
+_PEER_CREDENTIALS = struct.Struct('3i')
+
+# Shared decoder for incrementally parsing unframed (legacy) messages
+_JSON_DECODER = json.JSONDecoder()
+
+# Frame-prefixed copies of the constant replies, keyed by their JSON bytes
+_FRAMED_RESPONSES = {}
+
+
+def _constant_response(response: dict) -> bytes:
+    """Encode a reply that never changes once, along with its framed form"""
+    message = json_dumps(response)
+    _FRAMED_RESPONSES[message] = encode_frame(message)
+    return message
+
+
+# Replies that never change, encoded once
+_RESPONSE_BUSY = _constant_response({'status': 'error', 'message': 'Display is busy, try again later'})
+_RESPONSE_NOT_OBJECT = _constant_response({'status': 'error', 'message': 'Command must be a JSON object'})
+_RESPONSE_NOT_INITIALIZED = _constant_response({'status': 'error', 'message': 'Display not initialized'})
+_RESPONSE_CLEARED = _constant_response({'status': 'success', 'message': 'Display cleared'})
+_RESPONSE_SLEEPING = _constant_response({'status': 'success', 'message': 'Display put to sleep'})
+_RESPONSE_AWAKE = _constant_response({'status': 'success', 'message': 'Display woken up'})
+_RESPONSE_UNCHANGED = _constant_response({'status': 'success', 'message': 'Display already shows this content', 'cached': True})
+
+# Actions that draw content and are skipped when it is already shown; a
+# clear always runs, since clearing again is how ghosting is removed, unless
+# a full 4-gray redraw directly follows it and removes the ghosting instead
+_DRAW_ACTIONS = frozenset(('display_text', 'display_image'))
+
+# Values display_text uses for the fields a command leaves out; a compact
+# MSG_COMMAND frame leaves out the colors, a JSON command may leave out any
+_TEXT_DEFAULTS = {'x': 10, 'y': 10, 'font_size': 24, 'text_color': 'black', 'background_color': 'white'}
+
+
+def _read_fd(fd, size):
+    """
+    Read up to `size` bytes from the start of an open file into a new buffer
+    
+    Returns a memoryview of what was read, which is shorter than `size` if
+    the file was truncated in the meantime.
+    """
+    view = memoryview(bytearray(size))
+    pos = 0
+    while pos < size:
+        received = os.readv(fd, [view[pos:]])
+        if not received:
+            break
+        pos += received
+    return view[:pos]
+
+
+class _EinkWrapper:
+    """The display as older code expects to find it in EInkService.eink"""
+    __slots__ = ('driver',)
+    
+    def __init__(self, display):
+        self.driver = display
+    
+    def initialize(self):
+        init = getattr(self.driver, 'init', None)
+        return init() if init is not None else None
+
+
+class _Connection:
+    """A client connection, its partly received request and unsent replies"""
+    __slots__ = ('sock', 'addr', 'peer_uid', 'inbuf', 'framed', 'last_byte', 'deadline',
+                 'replies', 'outbox', 'pending', 'closing', 'closed')
+    
+    def __init__(self, sock, addr, peer_uid=None):
+        self.sock = sock
+        self.addr = addr
+        self.peer_uid = peer_uid  # User id of a local (Unix socket) client
+        self.inbuf = bytearray()
+        self.framed = None  # Unknown until the first byte arrives
+        self.last_byte = b''  # Last non-whitespace byte of an unframed request
+        self.deadline = time.monotonic() + CLIENT_TIMEOUT
+        self.replies = deque()  # Replies in request order, None while the command runs
+        self.outbox = deque()
+        self.pending = 0  # Bytes in outbox
+        self.closing = False  # No further requests; close once every reply has been written
+        self.closed = False
+
+
+class _Waker:
+    """
+    Wakes a thread blocked in select() from another thread
+    
+    Uses an eventfd where the platform has one (Linux, Python 3.10+): a
+    single descriptor whose counter any number of wakeups simply add to.
+    Elsewhere a non-blocking socket pair stands in for it.
+    """
+    
+    def __init__(self):
+        if hasattr(os, 'eventfd'):
+            self._fd = os.eventfd(0, os.EFD_NONBLOCK | os.EFD_CLOEXEC)
+            self._pair = None
+        else:
+            self._pair = socket.socketpair()
+            for sock in self._pair:
+                sock.setblocking(False)
+            self._fd = self._pair[0].fileno()
+    
+    def fileno(self):
+        """Descriptor to register for EVENT_READ"""
+        return self._fd
+    
+    def wake(self):
+        """Make the descriptor readable; safe to call from any thread"""
+        if self._pair is None:
+            os.eventfd_write(self._fd, 1)
+        else:
+            try:
+                self._pair[1].send(b'\0')
+            except BlockingIOError:
+                pass  # A wakeup is already pending
+    
+    def drain(self):
+        """Consume pending wakeups so the descriptor stops polling ready"""
+        try:
+            if self._pair is None:
+                os.eventfd_read(self._fd)
+            else:
+                while self._pair[0].recv(4096):
+                    pass
+        except BlockingIOError:
+            pass
+    
+    def close(self):
+        """Release the descriptor(s)"""
+        if self._pair is None:
+            os.close(self._fd)
+        else:
+            for sock in self._pair:
+                sock.close()
 
 
 class EInkService:
@@ -135,42 +284,148 @@ class EInkService:
         self.display = None
         self.eink = None  # Add this for backward compatibility with old code
         self.socket_server = None
+        self.server_thread = None
+        # Handlers for 'debug' commands, keyed by request type
+        self._debug_command_handlers = {}
         self.clients = []
-        self.command_queue = []
+        self.command_queue = queue.SimpleQueue()
+        # Commands queued whose results have not been sent yet; only the
+        # server loop updates it
+        self._outstanding = 0
         self.use_tcp = os.environ.get('EINK_USE_TCP', '0') == '1'
         self.socket_path = os.environ.get('EINK_SOCKET_PATH', DEFAULT_SOCKET_PATH)
         self.pid_path = os.environ.get('EINK_PID_PATH', "/tmp/eink_service.pid")
         self.tcp_port = int(os.environ.get('EINK_TCP_PORT', DEFAULT_TCP_PORT))
-        self.tcp_host = os.environ.get('EINK_TCP_HOST', 'localhost')
-        self.lock = threading.RLock()
+        self.tcp_host = os.environ.get('EINK_TCP_HOST', DEFAULT_TCP_HOST)
         self.initialized = False
         self.mock_mode = os.environ.get('EINK_MOCK_MODE', '0') == '1'
         self.force_kill_gpio = os.environ.get('EINK_FORCE_KILL_GPIO', '0') == '1'
         self.init_retries = 0
+        self._gpio_users_cache = None  # (monotonic time, processes) of the last scan
         self.max_init_retries = int(os.environ.get('EINK_MAX_INIT_RETRIES', MAX_RETRIES))
-        # Add a flag to track if the socket server is ready
-        self.socket_server_ready = threading.Event()
+        self.realtime = os.environ.get('EINK_RT', '0') == '1'
+        # Directories display_file commands may read from; none by default
+        self.image_dirs = [
+            os.path.realpath(directory)
+            for directory in os.environ.get('EINK_IMAGE_DIRS', '').split(os.pathsep) if directory
+        ]
+        # Handlers for the actions clients can request
+        self._actions = {
+            'clear': self._do_clear,
+            'display_text': self._do_display_text,
+            'display_image': self._do_display_image,
+            'sleep': self._do_sleep,
+            'wake': self._do_wake,
+            'status': self._do_status,
+            'debug': self._do_debug
+        }
+        # Set once the display is up; see start()
+        self._display_type_name = None
+        # Optional driver methods, None when the display lacks them, and its
+        # size; resolved once in _display_ready()
+        self._display_text = None
+        self._display_image = None
+        self._display_file = None
+        self._display_refresh = None
+        self._display_clear = None
+        self._display_size = (280, 480)  # Waveshare 3.7" until the driver says otherwise
+        self._status_responses = None
+        self.realtime_cpu = int(os.environ.get('EINK_RT_CPU', 1))
+        # Every display call runs on this one worker, in order, so a slow
+        # refresh never holds up the server loop
+        self._display_exec = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix='eink-hw',
+            initializer=self._apply_realtime_tuning if self.realtime else None
+        )
+        # Digest of the last drawing command that succeeded, while the display
+        # still shows its output; only the display worker touches it
+        self._shown_content = None
+        # (conn, result) pairs the worker has finished, sent by the server loop
+        self._finished = deque()
+        # Wakes the server loop out of select() on shutdown and when the
+        # display worker has results to send
+        self._waker = _Waker()
+        self._selector = None
+        # Open client connections, including those no longer watched for
+        # reading after a half-close, so shutdown can close them all
+        self._connections = set()
+        # Receive buffer reused for every read by the server loop
+        self._recv_view = memoryview(bytearray(MAX_MSG_SIZE))
         
         # Refresh counter for tracking when to do a full refresh
         self.update_counter = 0
         self.full_refresh_interval = FULL_REFRESH_INTERVAL
         self.clear_on_full_refresh = CLEAR_ON_FULL_REFRESH
-        logger.info(f"Full refresh will occur every {self.full_refresh_interval} updates")
-        
-        # Setup signal handlers for graceful shutdown
-        signal.signal(signal.SIGINT, self.signal_handler)
-        signal.signal(signal.SIGTERM, self.signal_handler)
+        logger.info("Full refresh will occur every %s updates", self.full_refresh_interval)
         
         # Write PID file for external process management
         try:
             with open(self.pid_path, 'w') as pid_file:
                 pid_file.write(str(os.getpid()))
-            logger.debug(f"Wrote PID {os.getpid()} to {self.pid_path}")
+            logger.debug("Wrote PID %s to %s", os.getpid(), self.pid_path)
         except Exception as e:
-            logger.warning(f"Failed to write PID file: {e}")
+            logger.warning("Failed to write PID file: %s", e)
         
         logger.info("EInk Service initialized successfully")
     
+    def _find_gpio_users(self) -> List[Dict[str, str]]:
+        """
+        Find processes holding the GPIO character device open
+        
+        start() and the display init retries ask several times in a row, so a
+        scan younger than GPIO_SCAN_TTL is reused; killing processes clears it.
+        
+        Returns:
+            List of {'pid': ..., 'command': ...} dicts, excluding this process
+        """
+        cache = self._gpio_users_cache
+        if cache is not None and time.monotonic() - cache[0] < GPIO_SCAN_TTL:
+            return cache[1]
+        processes = self._scan_gpio_users()
+        self._gpio_users_cache = (time.monotonic(), processes)
+        return processes
+    
+    def _scan_gpio_users(self) -> List[Dict[str, str]]:
+        """
+        Walk /proc/<pid>/fd for descriptors of GPIO_CHIP_PATH
+        
+        Each descriptor's device number is matched against the chip's, so no
+        lsof process has to be spawned. Processes whose descriptors we may
+        not read are skipped.
+        """
+        try:
+            target = os.stat(GPIO_CHIP_PATH).st_rdev
+        except FileNotFoundError:
+            return []
+        
+        own_pid = str(os.getpid())
+        processes = []
+        with os.scandir('/proc') as proc_entries:
+            for proc in proc_entries:
+                pid = proc.name
+                if not pid.isdigit() or pid == own_pid:
+                    continue
+                try:
+                    with os.scandir(f'/proc/{pid}/fd') as fds:
+                        holds_chip = any(self._is_device(fd, target) for fd in fds)
+                    if not holds_chip:
+                        continue
+                    with open(f'/proc/{pid}/comm') as comm:
+                        command = comm.read().strip()
+                except (PermissionError, FileNotFoundError, ProcessLookupError):
+                    continue  # Not ours to inspect, or already gone
+                processes.append({'pid': pid, 'command': command})
+        return processes
+    
+    @staticmethod
+    def _is_device(fd_entry, rdev) -> bool:
+        """Check whether an open file descriptor refers to the given character device"""
+        try:
+            st = fd_entry.stat()
+        except OSError:
+            return False
+        return stat.S_ISCHR(st.st_mode) and st.st_rdev == rdev
+    
     def _check_gpio_availability(self) -> Tuple[bool, str]:
         """
         Check if GPIO pins are available and not in use by other processes
@@ -180,30 +435,9 @@ class EInkService:
         """
         try:
             # Check if any processes are using GPIO
-            result = subprocess.run(['lsof', '/dev/gpiochip0'], 
-                                  stdout=subprocess.PIPE, 
-                                  stderr=subprocess.PIPE, 
-                                  text=True)
-            
-            if result.returncode != 0:
-                return True, "No processes found using GPIO"
-                
-            lines = result.stdout.strip().split('\n')
-            if len(lines) <= 1:  # Just the header or empty
-                return True, "No processes found using GPIO"
-                
-            # Extract PIDs and command details
-            processes = []
-            for line in lines[1:]:  # Skip header
-                parts = line.split()
-                if len(parts) >= 2:
-                    processes.append({
-                        'pid': parts[1],
-                        'command': parts[0]
-                    })
-            
+            processes = self._find_gpio_users()
             if not processes:
-                return True, "No processes using GPIO"
+                return True, "No processes found using GPIO"
             
             message = f"Found {len(processes)} processes using GPIO:"
             for proc in processes:
@@ -212,7 +446,7 @@ class EInkService:
             return False, message
             
         except Exception as e:
-            logger.error(f"Error checking GPIO availability: {e}")
+            logger.error("Error checking GPIO availability: %s", e)
             return False, f"Error checking GPIO: {str(e)}"
     
     def _kill_gpio_processes(self) -> Tuple[bool, str]:
@@ -227,57 +461,38 @@ class EInkService:
         
         try:
             # Check if any processes are using GPIO
-            result = subprocess.run(['lsof', '/dev/gpiochip0'], 
-                                  stdout=subprocess.PIPE, 
-                                  stderr=subprocess.PIPE, 
-                                  text=True)
-            
-            if result.returncode != 0:
-                return True, "No processes found using GPIO"
-                
-            lines = result.stdout.strip().split('\n')
-            if len(lines) <= 1:  # Just the header or empty
-                return True, "No processes found using GPIO"
-                
-            # Extract PIDs and command details
-            processes = []
-            for line in lines[1:]:  # Skip header
-                parts = line.split()
-                if len(parts) >= 2:
-                    processes.append({
-                        'pid': parts[1],
-                        'command': parts[0]
-                    })
-            
+            processes = self._find_gpio_users()
             if not processes:
-                return True, "No processes using GPIO"
+                return True, "No processes found using GPIO"
             
             # Kill each process
             killed_pids = []
             for proc in processes:
                 pid = proc['pid']
-                logger.info(f"Killing process {pid}")
-                subprocess.run(['kill', '-9', pid], 
-                              stdout=subprocess.PIPE, 
-                              stderr=subprocess.PIPE)
-                killed_pids.append(pid)
-            
-            # Wait a moment for processes to terminate
-            time.sleep(1)
-            
-            # Check if they're gone
-            result = subprocess.run(['lsof', '/dev/gpiochip0'], 
-                                  stdout=subprocess.PIPE, 
-                                  stderr=subprocess.PIPE, 
-                                  text=True)
+                logger.info("Killing process %s", pid)
+                try:
+                    os.kill(int(pid), signal.SIGKILL)
+                    killed_pids.append(pid)
+                except ProcessLookupError:
+                    pass  # Exited on its own
+                except PermissionError as e:
+                    logger.warning("Not allowed to kill process %s: %s", pid, e)
             
-            if result.returncode == 0 and len(result.stdout.strip().split('\n')) > 1:
-                return False, "Some processes still using GPIO after kill attempt"
+            # Rescan until they are gone rather than sleeping for the whole
+            # timeout; a killed process usually releases the chip at once
+            deadline = time.monotonic() + GPIO_RELEASE_TIMEOUT
+            while True:
+                self._gpio_users_cache = None
+                if not self._find_gpio_users():
+                    break
+                if time.monotonic() >= deadline:
+                    return False, "Some processes still using GPIO after kill attempt"
+                time.sleep(GPIO_RELEASE_POLL)
             
             return True, f"Successfully killed processes: {', '.join(killed_pids)}"
             
         except Exception as e:
-            logger.error(f"Error killing GPIO processes: {e}")
+            logger.error("Error killing GPIO processes: %s", e)
             return False, f"Error killing GPIO processes: {str(e)}"
     
     def start(self):
@@ -287,45 +502,30 @@ class EInkService:
         # Set initialized flag to false initially
         self.initialized = False
         
-        # Register signal handlers
-        signal.signal(signal.SIGINT, self.signal_handler)
-        signal.signal(signal.SIGTERM, self.signal_handler)
+        # Register signal handlers; systemd stops the service with SIGTERM
+        for sig in (signal.SIGINT, signal.SIGTERM, signal.SIGHUP):
+            signal.signal(sig, self.signal_handler)
+        # Release the display and socket file even if the owner never calls stop()
+        atexit.register(self.stop)
 
         try:
-            # Check if GPIO is available
-            gpio_available, message = self._check_gpio_availability()
-            logger.info(f"GPIO availability check: {message}")
-            
-            if not gpio_available and self.force_kill_gpio:
-                # Try to kill processes using GPIO
-                kill_success, kill_message = self._kill_gpio_processes()
-                logger.info(f"GPIO process cleanup: {kill_message}")
-                
-                # Check again after killing
-                gpio_available, message = self._check_gpio_availability()
-                logger.info(f"GPIO availability after cleanup: {message}")
-            
-            # Initialize display (with retry mechanism)
+            # Initialize display (checks GPIO, retries and falls back to mock mode)
             if not self._initialize_display():
-                logger.error("Failed to initialize display after retries, using mock mode")
-                self.mock_mode = True
-                if not self._initialize_display():  # Try once more with mock mode
-                    logger.error("Failed to initialize display even in mock mode")
-                    return False
+                logger.error("Failed to initialize display even in mock mode")
+                return False
             
-            # Backward compatibility: If there's a reference to self.eink, set it up
-            if hasattr(self, 'eink') and self.eink is None and self.display is not None:
-                logger.info("Setting up backward compatibility for eink attribute")
-                class EinkWrapper:
-                    def __init__(self, display):
-                        self.driver = display
-                    
-                    def initialize(self):
-                        if hasattr(self.driver, 'init'):
-                            return self.driver.init()
-                        return None
-                        
-                self.eink = EinkWrapper(self.display)
+            # The display does not change from here on, so resolve and
+            # encode what status reports about it once
+            self._display_type_name = type(self.display).__name__ if self.display else None
+            self._status_responses = {
+                initialized: _constant_response({
+                    'status': 'success',
+                    'initialized': initialized,
+                    'mock_mode': self.mock_mode,
+                    'display_type': self._display_type_name
+                })
+                for initialized in (True, False)
+            }
             
             # Mark as initialized - this is what the main loop checks for termination
             self.initialized = True
@@ -336,24 +536,14 @@ class EInkService:
             socket_setup_success = self._setup_socket_server()
             if not socket_setup_success:
                 logger.error("Failed to set up socket server, service will not be able to receive commands")
-                self.initialized = False  # Important: Mark as not initialized if we fail
+                # Release the display, which is already initialized at this point
+                self.cleanup()
                 return False
             
-            # Wait for socket server to be ready (with timeout)
-            logger.info("Waiting for socket server to be ready...")
-            if not self.socket_server_ready.wait(timeout=5.0):
-                logger.error("Timed out waiting for socket server to be ready")
-                self.initialized = False  # Important: Mark as not initialized if we fail
-                return False
-                
-            logger.info("Socket server is ready, starting command processing loop...")
-            
-            # Start command processing loop
-            self._process_commands()
+            logger.info("Socket server is ready, processing commands")
             
         except Exception as e:
-            logger.error(f"Error starting EInk service: {e}")
-            logger.error(traceback.format_exc())
+            logger.exception("Error starting EInk service: %s", e)
             
             # Clean up resources as best we can
             self.cleanup()
@@ -364,48 +554,42 @@ class EInkService:
     
     def stop(self):
         """Stop the service and clean up resources."""
-        if not hasattr(self, 'initialized') or not self.initialized:
+        if not self.initialized:
             logger.warning("EInk service not initialized, nothing to stop")
             return
 
         logger.info("Stopping EInk service")
         stop_start_time = time.time()
+        atexit.unregister(self.stop)
         
         # Set the stop event to signal threads to exit
-        if hasattr(self, 'stop_event'):
-            logger.info("Setting stop event")
-            self.stop_event.set()
+        logger.info("Setting stop event")
+        self.stop_event.set()
         
-        # Forcefully close the socket server first to unblock any accept() calls
-        if hasattr(self, 'socket_server') and self.socket_server:
-            logger.info("Closing socket server")
-            try:
-                # Try to shutdown the socket first to unblock any blocking calls
-                if hasattr(self.socket_server, 'shutdown'):
-                    try:
-                        self.socket_server.shutdown(socket.SHUT_RDWR)
-                        logger.info("Socket server shutdown called")
-                    except Exception as e:
-                        logger.warning(f"Socket server shutdown failed: {e}")
-                
-                # Close the socket
-                self.socket_server.close()
-                logger.info("Socket server closed")
-            except Exception as e:
-                logger.error(f"Error closing socket server: {e}")
+        # Wake the server loop so it notices the stop event right away
+        self._wake_server()
         
         # Wait for the server thread to finish if it's running
-        if hasattr(self, 'server_thread') and self.server_thread and self.server_thread.is_alive():
+        if self.server_thread is not None and self.server_thread.is_alive():
             logger.info("Waiting for server thread to finish")
             try:
                 self.server_thread.join(timeout=3)  # Wait up to 3 seconds
                 if self.server_thread.is_alive():
                     logger.warning("Server thread did not finish in time, proceeding with cleanup")
             except Exception as e:
-                logger.error(f"Error joining server thread: {e}")
+                logger.error("Error joining server thread: %s", e)
+        
+        # Close the socket server once nothing is selecting on it any more
+        if self.socket_server is not None:
+            logger.info("Closing socket server")
+            try:
+                self.socket_server.close()
+                logger.info("Socket server closed")
+            except Exception as e:
+                logger.error("Error closing socket server: %s", e)
         
         # Force close file descriptors if thread didn't exit
-        if hasattr(self, 'server_thread') and self.server_thread and self.server_thread.is_alive():
+        if self.server_thread is not None and self.server_thread.is_alive():
             logger.warning("Server thread still alive after join timeout, forcing file descriptor closure")
             
             # Try to find and close any open file descriptors
@@ -418,269 +602,509 @@ class EInkService:
                     except OSError:
                         pass  # File descriptor wasn't open
             except Exception as e:
-                logger.error(f"Error while force-closing file descriptors: {e}")
+                logger.error("Error while force-closing file descriptors: %s", e)
+        
+        # Let the display worker finish what it was given before releasing the hardware
+        self._display_exec.shutdown(wait=True)
         
         # Perform resource cleanup
         self.cleanup()
+        self._waker.close()
         
         # Final check to ensure we're marked as not initialized
         self.initialized = False
         
         # Log total stop time
         stop_duration = time.time() - stop_start_time
-        logger.info(f"EInk service stopped (took {stop_duration:.2f}s)")
+        logger.info("EInk service stopped (took %.2fs)", stop_duration)
     
     def signal_handler(self, sig, frame):
-        """Handle termination signals for graceful shutdown"""
-        logger.info(f"Received signal {sig}, shutting down")
-        self.stop()
+        """
+        Handle termination signals for graceful shutdown
+        
+        Only sets the stop event: the thread waiting on it calls stop(), so the
+        cleanup does not run inside the signal handler.
+        """
+        logger.info("Received signal %s, shutting down", sig)
+        self.stop_event.set()
     
-    def run_unix_socket_server(self):
-        """Run the Unix domain socket server"""
-        logger.info("Starting Unix socket server at {}".format(self.socket_path))
+    def _create_listener(self) -> bool:
+        """
+        Create the listening socket the server loop accepts clients on
         
-        # Check if socket file already exists
-        if os.path.exists(self.socket_path):
-            try:
-                os.unlink(self.socket_path)
-                logger.info(f"Removed existing socket file: {self.socket_path}")
-            except OSError as e:
-                logger.error(f"Error removing existing socket file: {e}")
-                self.socket_server_ready.set()  # Set event to unblock main thread
-                return
+        Runs in the thread calling start(), so a socket that cannot be bound
+        fails start() directly instead of being reported back from the
+        server thread.
+        
+        Returns:
+            bool: True if self.socket_server is bound and listening
+        """
+        try:
+            if self.use_tcp:
+                self._create_tcp_listener()
+            else:
+                self._create_unix_listener()
+            return True
+        except Exception as e:
+            logger.exception("Error creating socket server: %s", e)
+            if self.socket_server is not None:
+                self.socket_server.close()
+                self.socket_server = None
+            return False
+    
+    def _create_unix_listener(self):
+        """Bind and listen on the Unix domain socket, replacing a stale socket file"""
+        logger.info("Starting Unix socket server at %s", self.socket_path)
+        
+        # Remove a socket file left behind by a previous run
+        try:
+            os.unlink(self.socket_path)
+            logger.info("Removed existing socket file: %s", self.socket_path)
+        except FileNotFoundError:
+            pass
         
         # Create socket directory if it doesn't exist
         socket_dir = os.path.dirname(self.socket_path)
         if not os.path.exists(socket_dir):
-            try:
-                os.makedirs(socket_dir, exist_ok=True)
-                logger.info(f"Created socket directory: {socket_dir}")
-            except OSError as e:
-                logger.error(f"Error creating socket directory: {e}")
-                self.socket_server_ready.set()  # Set event to unblock main thread
-                return
+            os.makedirs(socket_dir, exist_ok=True)
+            logger.info("Created socket directory: %s", socket_dir)
+        
+        self.socket_server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        logger.debug("Created Unix socket with file descriptor: %s", self.socket_server.fileno())
+        self.socket_server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
         
+        # Bind to the socket path
         try:
-            # Create the socket
-            self.socket_server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
-            logger.debug(f"Created Unix socket with file descriptor: {self.socket_server.fileno()}")
-            
-            # Set socket options
-            self.socket_server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-            logger.debug("Set SO_REUSEADDR option on socket")
-            
-            # Bind to the socket path
-            try:
-                self.socket_server.bind(self.socket_path)
-                logger.info(f"Bound socket to path: {self.socket_path}")
-            except OSError as e:
-                if e.errno == errno.EADDRINUSE:
-                    logger.error(f"Socket address already in use: {self.socket_path}")
-                    # Try to forcibly remove the socket file and rebind
-                    try:
-                        os.unlink(self.socket_path)
-                        logger.info(f"Forcibly removed existing socket file: {self.socket_path}")
-                        self.socket_server.bind(self.socket_path)
-                        logger.info(f"Successfully rebound socket to path: {self.socket_path}")
-                    except Exception as rebind_error:
-                        logger.error(f"Error rebinding socket: {rebind_error}")
-                        self.socket_server_ready.set()  # Set the event to unblock the main thread
-                        return
-                else:
-                    logger.error(f"Error binding socket: {e}")
-                    self.socket_server_ready.set()  # Set the event to unblock the main thread
-                    return
-            
-            # Set permissions on the socket file
-            try:
-                os.chmod(self.socket_path, 0o666)
-                logger.info(f"Set socket file permissions to 0o666")
-                # Log the actual permissions to verify
-                st = os.stat(self.socket_path)
-                logger.info(f"Socket file stats: mode={oct(st.st_mode)}, uid={st.st_uid}, gid={st.st_gid}")
-            except Exception as e:
-                logger.error(f"Error setting socket permissions: {e}")
-            
-            # Start listening
-            self.socket_server.listen(5)
-            logger.info(f"Socket server listening with backlog of 5")
-            
-            # Signal that the server is ready
-            self.socket_server_ready.set()
-            logger.info("Unix socket server ready")
-            
-            # Set a short timeout to allow checking the stop event
-            check_interval = 0.5  # seconds
-            self.socket_server.settimeout(check_interval)  # Very short timeout to allow frequent checks
-            
-            # Main server loop
-            while not self.stop_event.is_set():
-                
-                try:
-                    # Check if the socket is still valid
-                    if self.socket_server.fileno() == -1:
-                        logger.error("Socket descriptor is invalid, recreating socket")
-                        # Recreate the socket
-                        self.socket_server.close()
-                        self.socket_server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
-                        self.socket_server.bind(self.socket_path)
-                        self.socket_server.listen(5)
-                        self.socket_server.settimeout(check_interval)
-                        logger.info("Socket recreated successfully")
-                        continue
-
-                    logger.debug("Waiting for client connection...")
-                    client, _ = self.socket_server.accept()
-                    logger.info("Client connection accepted")
-                    self._handle_client(client)
-                except socket.timeout:
-                    # This just allows us to check the running flag
-                    logger.debug("Socket accept timeout (normal for polling)")
-                    continue
+            self.socket_server.bind(self.socket_path)
+        except OSError as e:
+            if e.errno != errno.EADDRINUSE:
+                raise
+            # Another process recreated the file since the unlink above
+            logger.error("Socket address already in use: %s", self.socket_path)
+            os.unlink(self.socket_path)
+            logger.info("Forcibly removed existing socket file: %s", self.socket_path)
+            self.socket_server.bind(self.socket_path)
+        logger.info("Bound socket to path: %s", self.socket_path)
+        
+        # Set permissions on the socket file
+        try:
+            os.chmod(self.socket_path, 0o666)
+            logger.info("Set socket file permissions to 0o666")
+            # Log the actual permissions to verify
+            st = os.stat(self.socket_path)
+            logger.info("Socket file stats: mode=%s, uid=%s, gid=%s", oct(st.st_mode), st.st_uid, st.st_gid)
         except Exception as e:
-            logger.error(f"Error setting up Unix socket server: {e}")
-            logger.error(traceback.format_exc())
-            self.initialized = False
-            # Clean up after failure
-            try:
-                if hasattr(self, 'socket_server') and self.socket_server:
-                    self.socket_server.close()
-                if os.path.exists(self.socket_path):
-                    os.unlink(self.socket_path)
-            except:
-                pass
+            logger.error("Error setting socket permissions: %s", e)
+        
+        # Start listening
+        self.socket_server.listen(LISTEN_BACKLOG)
+        logger.info("Unix socket server listening with backlog of %s", LISTEN_BACKLOG)
+    
+    def _create_tcp_listener(self):
+        """Bind and listen on the TCP port for network communication"""
+        logger.info("Starting TCP server at %s:%s", self.tcp_host, self.tcp_port)
+        self.socket_server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.socket_server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.socket_server.bind((self.tcp_host, self.tcp_port))
+        self.socket_server.listen(LISTEN_BACKLOG)
+        logger.info("TCP server listening with backlog of %s", LISTEN_BACKLOG)
     
-    def run_tcp_server(self):
-        """Run a TCP server for network communication"""
-        logger.info(f"Starting TCP server at {self.tcp_host}:{self.tcp_port}")
+    def _run_server(self):
+        """
+        Server thread entry point: serve clients until the service stops
         
-        # Check stop event frequently to enable responsive termination
-        check_interval = 0.1  # Check every 100ms
-        last_check_time = time.time()
+        However the loop ends, the stop event is set, so the thread waiting
+        on it stops the service and the process exits (and is restarted by
+        systemd) rather than staying up without a socket server.
+        """
+        try:
+            self._serve_connections()
+            logger.info("Socket server stopped")
+        except Exception as e:
+            logger.exception("Error in socket server loop: %s", e)
+        finally:
+            self.stop_event.set()
+    
+    def _serve_connections(self):
+        """
+        Accept client connections, read their commands and execute them until
+        the service stops
+        
+        The listening socket, accepted clients and the waker (an eventfd) are
+        registered with a selector (epoll on Linux), so the loop sleeps until
+        one of them is ready; stop() and the display worker wake it through the
+        waker. Commands queued while handling a batch of events are
+        handed to the display worker, the only thread touching the display, and
+        its results are sent once it posts them back.
+        Requests are assembled from whatever each client has sent so far and
+        replies a client is not ready to take are buffered per connection, so
+        no socket operation blocks the loop.
+        """
+        self._selector = selectors.DefaultSelector()
+        self.socket_server.setblocking(False)
+        self._selector.register(self.socket_server, selectors.EVENT_READ)
+        self._selector.register(self._waker, selectors.EVENT_READ)
         
         try:
-            # Create socket server
-            self.socket_server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            self.socket_server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-            self.socket_server.bind((self.tcp_host, self.tcp_port))
-            self.socket_server.listen(5)
-            self.socket_server.settimeout(check_interval)  # Very short timeout to allow frequent checks
-            
-            logger.info("TCP server ready")
-            
-            # Signal that the socket server is ready
-            self.socket_server_ready.set()
-            
-            while self.initialized and not self.stop_event.is_set():
-                # Check for termination more frequently
-                current_time = time.time()
-                if current_time - last_check_time >= check_interval:
-                    # Check if we should terminate
-                    if self.stop_event.is_set() or not self.initialized:
-                        logger.info("Stop event detected in socket server loop, breaking out")
-                        break
-                    last_check_time = current_time
+            while not self.stop_event.is_set():
+                for key, events in self._selector.select(self._select_timeout()):
+                    if key.fileobj is self._waker:
+                        self._waker.drain()
+                    elif key.fileobj is self.socket_server:
+                        self._accept_client()
+                    elif events & selectors.EVENT_WRITE:
+                        self._flush_connection(key.data)
+                    else:
+                        self._handle_client(key.data)
                 
-                try:
-                    client, addr = self.socket_server.accept()
-                    logger.debug(f"Connection from {addr}")
-                    self._handle_client(client)
-                except socket.timeout:
-                    # This just allows us to check the running flag
-                    continue
-                except Exception as e:
-                    if self.initialized:  # Only log if we're not in shutdown
-                        logger.error(f"Socket server error: {e}")
-                        logger.error(traceback.format_exc())
-            
-            # Clean up
-            self.socket_server.close()
-            logger.info("TCP server stopped")
-        except Exception as e:
-            logger.error(f"Error setting up TCP server: {e}")
-            logger.error(traceback.format_exc())
-            self.initialized = False
+                self._expire_connections()
+                
+                # Hand whatever the clients above queued to the display worker
+                self._process_queued_commands()
+                self._send_finished_results()
+        finally:
+            # Close clients that are still connected
+            for conn in list(self._connections):
+                self._close_connection(conn)
+            self._selector.close()
+    
+    def _apply_realtime_tuning(self):
+        """
+        Pin the calling thread to one CPU and give it a real-time policy
+        
+        This thread drives the display refresh, whose SPI timing suffers when
+        it is preempted. SCHED_FIFO needs CAP_SYS_NICE (or root), so failures
+        are logged and the thread keeps running with the default policy.
+        """
+        try:
+            os.sched_setaffinity(0, {self.realtime_cpu})
+            logger.info("Pinned display thread to CPU %s", self.realtime_cpu)
+        except (AttributeError, OSError) as e:
+            logger.warning("Could not pin display thread to CPU %s: %s", self.realtime_cpu, e)
+        
+        try:
+            os.sched_setscheduler(0, os.SCHED_FIFO, os.sched_param(REALTIME_PRIORITY))
+            logger.info("Display thread running with SCHED_FIFO priority %s", REALTIME_PRIORITY)
+        except (AttributeError, OSError) as e:
+            logger.warning("Could not set SCHED_FIFO for display thread: %s", e)
+    
+    def _accept_client(self):
+        """Accept a pending connection and start watching it for a command"""
+        try:
+            client, addr = self.socket_server.accept()
+        except BlockingIOError:
+            # Another wakeup already took the pending connection
+            return
+        except OSError as e:
+            if not self.stop_event.is_set():
+                logger.error("Error accepting client connection: %s", e)
+            return
+        logger.info("New client connection from %s", addr)
+        client.setblocking(False)
+        if self.use_tcp:
+            # Replies are small; send them without waiting on Nagle, and let
+            # the kernel notice remote clients that vanish without closing
+            client.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            client.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+            if hasattr(socket, 'TCP_KEEPIDLE'):
+                # The default waits two hours before the first probe
+                client.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPIDLE, KEEPALIVE_IDLE)
+                client.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPINTVL, KEEPALIVE_INTERVAL)
+                client.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPCNT, KEEPALIVE_COUNT)
+        peer_uid = None
+        if not self.use_tcp and hasattr(socket, 'SO_PEERCRED'):
+            creds = client.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, _PEER_CREDENTIALS.size)
+            _, peer_uid, _ = _PEER_CREDENTIALS.unpack(creds)
+        conn = _Connection(client, addr, peer_uid)
+        self._connections.add(conn)
+        self._selector.register(client, selectors.EVENT_READ, conn)
+    
+    @staticmethod
+    def _awaits_request(conn):
+        """Whether a client connection is waiting on the client rather than on the service"""
+        return (isinstance(conn, _Connection) and not conn.closing
+                and not conn.replies and not conn.outbox)
+    
+    def _select_timeout(self):
+        """Seconds until the earliest client read deadline, or None to wait indefinitely"""
+        deadlines = [
+            key.data.deadline for key in self._selector.get_map().values()
+            if self._awaits_request(key.data)
+        ]
+        if not deadlines:
+            return None
+        return max(0.0, min(deadlines) - time.monotonic())
     
-    def _handle_client(self, client):
-        """Handle a client connection and process their command"""
-        client_addr = "unknown"
+    def _expire_connections(self):
+        """Drop clients that did not send a complete request in time"""
+        now = time.monotonic()
+        for key in list(self._selector.get_map().values()):
+            conn = key.data
+            if self._awaits_request(conn) and conn.deadline <= now:
+                logger.warning("Timed out waiting for a request from client %s", conn.addr)
+                conn.closing = True
+                self._close_connection(conn)
+    
+    def _flush_connection(self, conn):
+        """Write as much buffered reply data as the client will take"""
         try:
-            # Get client address info for logging
+            self._write_outbox(conn)
+        except OSError as e:
+            logger.error("Error sending response: %s", e)
+            self._close_connection(conn)
+            return
+        
+        if conn.outbox:
+            return
+        if conn.closing and not conn.replies:
+            self._close_connection(conn)
+        else:
+            if not conn.replies:
+                conn.deadline = time.monotonic() + CLIENT_TIMEOUT
+            self._selector.modify(conn.sock, selectors.EVENT_READ, conn)
+    
+    def _write_outbox(self, conn):
+        """
+        Write buffered replies with as few sendmsg() calls as possible
+        
+        Stops when the outbox is empty or the socket would block; other
+        socket errors are raised to the caller.
+        """
+        outbox = conn.outbox
+        while outbox:
             try:
-                if hasattr(client, 'getpeername'):
-                    client_addr = str(client.getpeername())
-                elif hasattr(client, 'getsockname'):
-                    client_addr = str(client.getsockname())
-            except:
-                pass
-                
-            logger.info(f"New client connection from {client_addr}")
-            
-            # Set a timeout for receiving data
-            client.settimeout(5.0)
+                sent = conn.sock.sendmsg(list(islice(outbox, IOV_MAX)))
+            except BlockingIOError:
+                return
+            conn.pending -= sent
+            while sent:
+                data = outbox[0]
+                if sent < len(data):
+                    outbox[0] = memoryview(data)[sent:]
+                    return
+                sent -= len(data)
+                outbox.popleft()
+    
+    def _close_connection(self, conn):
+        """Stop watching a client connection and close it"""
+        conn.closed = True
+        conn.replies.clear()
+        self._connections.discard(conn)
+        try:
+            self._selector.unregister(conn.sock)
+        except (KeyError, ValueError):
+            pass  # Not registered (any more)
+        try:
+            conn.sock.close()
+        except OSError as e:
+            logger.error("Error closing client socket: %s", e)
+    
+    def _wake_server(self):
+        """Wake the server loop from another thread"""
+        try:
+            self._waker.wake()
+        except OSError as e:
+            logger.debug("Could not wake server loop: %s", e)
+    
+    def _handle_client(self, conn):
+        """
+        Read what a client has sent and handle its commands once they are complete
+        
+        A framed client may keep sending requests on the same connection until
+        it shuts down its sending side; an unframed (legacy) client sends a
+        single request per connection.
+        """
+        try:
+            size = conn.sock.recv_into(self._recv_view)
+        except BlockingIOError:
+            return
+        except OSError as e:
+            logger.error("Error reading from client %s: %s", conn.addr, e)
+            conn.closing = True
+            self._close_connection(conn)
+            return
+        
+        if conn.closing:
+            # The last request is complete and its results are still being produced
+            if size:
+                logger.warning("Ignoring %s bytes sent by client %s after its request", size, conn.addr)
+            else:
+                # The client stopped sending; results are still written once ready
+                self._selector.unregister(conn.sock)
+            return
+        
+        # Only valid until the next read, so it is copied into conn.inbuf
+        chunk = self._recv_view[:size]
+        logger.debug("Received chunk of size %s bytes from %s", size, conn.addr)
+        if chunk:
+            conn.inbuf += chunk
+            if conn.framed is None:
+                # Framed clients start with a header, older clients send bare JSON
+                legacy = is_legacy_message(conn.inbuf)
+                if legacy is None:
+                    return  # Only whitespace so far
+                conn.framed = not legacy
+        
+        try:
+            if conn.framed:
+                messages = self._take_frames(conn)
+            else:
+                message = self._take_legacy_message(conn, chunk)
+                messages = [] if message is None else [message]
             
-            # Read data from client
-            data = b""
-            while True:
-                try:
-                    chunk = client.recv(MAX_MSG_SIZE)
-                    logger.debug(f"Received chunk of size {len(chunk)} bytes from {client_addr}")
-                    if not chunk:
-                        logger.debug(f"Client {client_addr} closed connection (empty chunk)")
-                        break
-                    data += chunk
-                    
-                    # Check if we have a complete JSON object
-                    try:
-                        _ = json.loads(data.decode('utf-8'))
-                        logger.debug(f"Received complete JSON object from {client_addr}")
-                        break  # We have a complete JSON object
-                    except json.JSONDecodeError:
-                        logger.debug(f"Incomplete JSON, continuing to read from {client_addr}")
-                        pass  # Continue reading
-                except socket.timeout:
-                    logger.warning(f"Socket timeout while reading from client {client_addr}")
-                    break
-                except Exception as e:
-                    logger.error(f"Error reading from client {client_addr}: {e}")
-                    break
+            for data, command in messages:
+                conn.replies.append(self._handle_command(conn, data, command))
             
-            if not data:
-                logger.warning(f"No data received from client {client_addr}")
+            if chunk and conn.framed:
+                # Keep reading: the client may send further requests
+                if messages:
+                    conn.deadline = time.monotonic() + CLIENT_TIMEOUT
+                    self._send_ready_replies(conn)
                 return
-                
-            # Parse command
-            try:
-                command = json.loads(data.decode('utf-8'))
-                logger.info(f"Received command from {client_addr}: {command}")
-                
-                # Queue the command for processing
-                self.command_queue.append((client, command))
-                logger.debug(f"Command from {client_addr} queued for processing")
-                
-                # Send acknowledgement
-                response = {"status": "queued", "message": "Command accepted"}
-                client.send(json.dumps(response).encode('utf-8'))
-                logger.debug(f"Sent acknowledgement to {client_addr}: {response}")
-            except json.JSONDecodeError as e:
-                logger.error(f"Invalid JSON data from {client_addr}: {e}")
-                logger.error(f"Raw data: {data.decode('utf-8', errors='replace')}")
-                response = {"status": "error", "message": f"Invalid JSON data: {str(e)}"}
-                client.send(json.dumps(response).encode('utf-8'))
+            if chunk and not messages:
+                return  # Wait for the rest of the request
+            if not chunk:
+                if conn.framed and conn.inbuf:
+                    logger.warning("Client %s closed the connection mid-request", conn.addr)
+                elif conn.framed is None and not conn.inbuf:
+                    logger.warning("No data received from client %s", conn.addr)
         except Exception as e:
-            logger.error(f"Error handling client {client_addr}: {e}")
-            logger.error(traceback.format_exc())
-            try:
-                response = {"status": "error", "message": str(e)}
-                client.send(json.dumps(response).encode('utf-8'))
-            except:
-                logger.error(f"Failed to send error response to client {client_addr}")
-        finally:
-            try:
-                client.close()
-                logger.debug(f"Closed connection to client {client_addr}")
-            except:
-                logger.error(f"Error closing client socket for {client_addr}")
+            # Tracebacks only at DEBUG, so a misbehaving client cannot flood the log
+            logger.error("Error handling client %s: %s", conn.addr, e, exc_info=logger.isEnabledFor(logging.DEBUG))
+            conn.replies.append({"status": "error", "message": str(e)})
+        
+        # No further requests are read; close once the replies have been written
+        conn.closing = True
+        self._send_ready_replies(conn)
+    
+    def _send_ready_replies(self, conn):
+        """
+        Send the replies at the front of a connection's reply queue that are ready
+        
+        Replies go out in request order, so a reply waits behind any earlier
+        command that is still running on the display worker. Everything that
+        is ready goes out with one write, and a connection that takes no
+        further requests is closed once the last reply has been written.
+        """
+        ready = []
+        while conn.replies and conn.replies[0] is not None:
+            ready.append(conn.replies.popleft())
+        if ready:
+            self._send_responses(conn, ready, conn.framed)
+            if not conn.replies and not conn.outbox:
+                # Idle again: the client gets a fresh timeout for its next request
+                conn.deadline = time.monotonic() + CLIENT_TIMEOUT
+        if conn.closing and not conn.closed and not conn.replies and not conn.outbox:
+            self._close_connection(conn)
+            logger.debug("Closed connection to client %s", conn.addr)
+    
+    def _take_frames(self, conn):
+        """
+        Take every complete frame from a framed client's buffer
+        
+        A client may write several requests back to back, so everything that
+        has arrived is handled in one pass. An incomplete trailing frame is
+        left in conn.inbuf until the rest of it arrives.
+        
+        Returns:
+            List of (data, command) tuples with command None for JSON frames
+            (parsed later)
+        """
+        messages = []
+        view = memoryview(conn.inbuf)
+        offset = 0
+        while True:
+            frame = split_frame(view[offset:])
+            if frame is None:
+                break
+            msg_type, data, end = frame
+            offset += end
+            logger.debug("Received frame of type %s with %s bytes from %s", msg_type, len(data), conn.addr)
+            if msg_type == MSG_IMAGE:
+                # Image bytes arrive as-is after a small JSON header
+                header, image_bytes = decode_image_payload(data)
+                command = dict(header, image_bytes=image_bytes)
+                command.setdefault('action', 'display_image')
+                messages.append((data, command))
+            elif msg_type == MSG_JSON:
+                messages.append((data, None))
+            elif msg_type == MSG_COMMAND:
+                messages.append((data, decode_command_payload(data)))
+            else:
+                raise ValueError(f"Unsupported message type: {msg_type}")
+        
+        if offset:
+            # Taken frames still reference the old buffer, so start a new one
+            conn.inbuf = conn.inbuf[offset:]
+        return messages
+    
+    def _take_legacy_message(self, conn, chunk):
+        """
+        Take a complete JSON message from an unframed client's buffer
+        
+        Once the buffer ends in '}' it is parsed with raw_decode, which reports
+        where the first JSON document ends; before that a JSON object cannot be
+        complete, so no parse is attempted. Input that can never become a valid
+        command, such as JSON that is not an object, or a connection closed
+        early, is handed on as-is so the caller reports the error.
+        
+        Args:
+            conn: Client connection
+            chunk: The bytes just received (empty when the client closed the connection)
+        
+        Returns:
+            Tuple of (data, command) with command None if the data did not
+            decode, or None if more data is needed
+        """
+        buf = conn.inbuf
+        if not chunk:
+            return (bytes(buf), None) if buf else None
+        
+        stripped = bytes(chunk).rstrip()
+        if stripped:
+            if not conn.last_byte and buf.lstrip()[:1] != b'{':
+                # Anything but a JSON object can never become a command
+                return bytes(buf), None
+            conn.last_byte = stripped[-1:]
+        if conn.last_byte != b'}':
+            return None
+        
+        try:
+            text = buf.decode('utf-8')
+        except UnicodeDecodeError:
+            # Most likely a multi-byte character split across chunks
+            return None
+        
+        start = len(text) - len(text.lstrip())
+        try:
+            command, _ = _JSON_DECODER.raw_decode(text, start)
+        except json.JSONDecodeError as e:
+            # Truncated input either fails at the end of the buffer or,
+            # for a string cut short, at the opening quote of that string
+            if e.pos >= len(text) or e.msg.startswith('Unterminated string'):
+                logger.debug("Incomplete JSON, continuing to read from %s", conn.addr)
+                return None
+            return bytes(buf), None
+        
+        logger.debug("Received complete JSON object from %s", conn.addr)
+        return bytes(buf), command
+    
+    def _encode_response(self, response, framed=False):
+        """
+        Encode a response for the wire
+        
+        Args:
+            response: Response dictionary, or its already encoded JSON bytes
+            framed: Whether to prefix the length header expected by framed clients
+        """
+        if not isinstance(response, bytes):
+            response = json_dumps(response)
+        elif framed:
+            # Constant replies already have their header attached
+            framed_response = _FRAMED_RESPONSES.get(response)
+            if framed_response is not None:
+                return framed_response
+        return encode_frame(response) if framed else response
     
     def _setup_socket_server(self):
         """Set up the socket server (Unix domain socket or TCP)"""
@@ -692,50 +1116,54 @@ class EInkService:
         try:
             # Create and start the server thread
             if self.use_tcp:
-                logger.info(f"Using TCP socket server on {self.tcp_host}:{self.tcp_port}")
-                self.server_thread = threading.Thread(target=self.run_tcp_server)
+                logger.info("Using TCP socket server on %s:%s", self.tcp_host, self.tcp_port)
+                if self.tcp_host in ('127.0.0.1', 'localhost', '::1'):
+                    logger.warning("TCP mode is meant for remote clients; local clients "
+                                   "are faster over the Unix socket (unset EINK_USE_TCP)")
             else:
-                logger.info(f"Using Unix domain socket server at {self.socket_path}")
+                logger.info("Using Unix domain socket server at %s", self.socket_path)
                 
                 # Check if the directory for the socket exists
                 socket_dir = os.path.dirname(self.socket_path)
                 if not os.path.exists(socket_dir):
-                    logger.warning(f"Socket directory {socket_dir} does not exist, trying to create it")
+                    logger.warning("Socket directory %s does not exist, trying to create it", socket_dir)
                     try:
                         os.makedirs(socket_dir, exist_ok=True)
-                        logger.info(f"Created socket directory: {socket_dir}")
+                        logger.info("Created socket directory: %s", socket_dir)
                     except Exception as e:
-                        logger.error(f"Failed to create socket directory: {e}")
+                        logger.error("Failed to create socket directory: %s", e)
                         return False
                 
                 # Check if we have write permission to the socket directory
                 if not os.access(socket_dir, os.W_OK):
-                    logger.error(f"No write permission to socket directory: {socket_dir}")
+                    logger.error("No write permission to socket directory: %s", socket_dir)
                     return False
                 
                 # Check for existing socket file
                 if os.path.exists(self.socket_path):
-                    logger.warning(f"Socket file already exists at {self.socket_path}, will be removed by server thread")
+                    logger.warning("Socket file already exists at %s, it will be replaced", self.socket_path)
                     try:
                         # Check if it's actually a socket
                         mode = os.stat(self.socket_path).st_mode
                         is_socket = stat.S_ISSOCK(mode)
                         if not is_socket:
-                            logger.error(f"Existing file at {self.socket_path} is not a socket (mode={oct(mode)})")
+                            logger.error("Existing file at %s is not a socket (mode=%s)", self.socket_path, oct(mode))
                     except Exception as e:
-                        logger.warning(f"Error checking existing socket file: {e}")
-                
-                self.server_thread = threading.Thread(target=self.run_unix_socket_server)
-                
+                        logger.warning("Error checking existing socket file: %s", e)
+            
+            if not self._create_listener():
+                return False
+            logger.info("Socket server ready")
+            
             # Mark as daemon so it terminates when the main thread exits
+            self.server_thread = threading.Thread(target=self._run_server, name='eink-server')
             self.server_thread.daemon = True
             self.server_thread.start()
             
             logger.info("Socket server thread started")
             return True
         except Exception as e:
-            logger.error(f"Error setting up socket server: {e}")
-            logger.error(traceback.format_exc())
+            logger.exception("Error setting up socket server: %s", e)
             return False
     
     def _run_socket_diagnostics(self):
@@ -744,40 +1172,40 @@ class EInkService:
         
         # Check if we're using Unix socket or TCP
         if self.use_tcp:
-            logger.info(f"Socket type: TCP on {self.tcp_host}:{self.tcp_port}")
+            logger.info("Socket type: TCP on %s:%s", self.tcp_host, self.tcp_port)
             
             # Check if the port is already in use
             try:
                 test_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
                 test_socket.bind((self.tcp_host, self.tcp_port))
                 test_socket.close()
-                logger.info(f"TCP port {self.tcp_port} is available")
+                logger.info("TCP port %s is available", self.tcp_port)
             except OSError as e:
                 if e.errno == errno.EADDRINUSE:
-                    logger.error(f"TCP port {self.tcp_port} is already in use")
+                    logger.error("TCP port %s is already in use", self.tcp_port)
                 else:
-                    logger.error(f"Error checking TCP port: {e}")
+                    logger.error("Error checking TCP port: %s", e)
         else:
-            logger.info(f"Socket type: Unix domain socket at {self.socket_path}")
+            logger.info("Socket type: Unix domain socket at %s", self.socket_path)
             
             # Check socket directory
             socket_dir = os.path.dirname(self.socket_path)
-            logger.info(f"Socket directory: {socket_dir}")
+            logger.info("Socket directory: %s", socket_dir)
             
             if os.path.exists(socket_dir):
-                logger.info(f"Socket directory exists: {socket_dir}")
+                logger.info("Socket directory exists: %s", socket_dir)
                 
                 # Check directory permissions
                 try:
                     dir_stat = os.stat(socket_dir)
-                    logger.info(f"Socket directory permissions: {oct(dir_stat.st_mode)}")
-                    logger.info(f"Socket directory owner: uid={dir_stat.st_uid}, gid={dir_stat.st_gid}")
+                    logger.info("Socket directory permissions: %s", oct(dir_stat.st_mode))
+                    logger.info("Socket directory owner: uid=%s, gid=%s", dir_stat.st_uid, dir_stat.st_gid)
                     
                     # Check if we have write permission
                     if os.access(socket_dir, os.W_OK):
-                        logger.info(f"We have write permission to socket directory: {socket_dir}")
+                        logger.info("We have write permission to socket directory: %s", socket_dir)
                     else:
-                        logger.error(f"No write permission to socket directory: {socket_dir}")
+                        logger.error("No write permission to socket directory: %s", socket_dir)
                         
                         # Check current user and group
                         try:
@@ -786,412 +1214,614 @@ class EInkService:
                             current_gid = os.getgid()
                             user_name = pwd.getpwuid(current_uid).pw_name
                             group_name = grp.getgrgid(current_gid).gr_name
-                            logger.info(f"Current user: {user_name} (uid={current_uid})")
-                            logger.info(f"Current group: {group_name} (gid={current_gid})")
+                            logger.info("Current user: %s (uid=%s)", user_name, current_uid)
+                            logger.info("Current group: %s (gid=%s)", group_name, current_gid)
                         except Exception as e:
-                            logger.error(f"Error getting current user/group info: {e}")
+                            logger.error("Error getting current user/group info: %s", e)
                 except Exception as e:
-                    logger.error(f"Error checking socket directory permissions: {e}")
+                    logger.error("Error checking socket directory permissions: %s", e)
             else:
-                logger.error(f"Socket directory does not exist: {socket_dir}")
+                logger.error("Socket directory does not exist: %s", socket_dir)
                 
                 # Check if we can create the directory
                 try:
                     parent_dir = os.path.dirname(socket_dir)
                     if os.path.exists(parent_dir):
                         if os.access(parent_dir, os.W_OK):
-                            logger.info(f"We have permission to create socket directory in: {parent_dir}")
+                            logger.info("We have permission to create socket directory in: %s", parent_dir)
                         else:
-                            logger.error(f"No permission to create socket directory in: {parent_dir}")
+                            logger.error("No permission to create socket directory in: %s", parent_dir)
                     else:
-                        logger.error(f"Parent directory does not exist: {parent_dir}")
+                        logger.error("Parent directory does not exist: %s", parent_dir)
                 except Exception as e:
-                    logger.error(f"Error checking parent directory: {e}")
+                    logger.error("Error checking parent directory: %s", e)
             
             # Check if socket file already exists
             if os.path.exists(self.socket_path):
-                logger.info(f"Socket file already exists: {self.socket_path}")
+                logger.info("Socket file already exists: %s", self.socket_path)
                 
                 # Check if it's actually a socket
                 try:
                     mode = os.stat(self.socket_path).st_mode
                     is_socket = stat.S_ISSOCK(mode)
                     if is_socket:
-                        logger.info(f"Existing file is a socket: {self.socket_path}")
+                        logger.info("Existing file is a socket: %s", self.socket_path)
                         
                         # Try to connect to the socket to see if it's active
                         try:
                             test_socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
                             test_socket.settimeout(1.0)
                             test_socket.connect(self.socket_path)
-                            logger.warning(f"Socket is active and accepting connections: {self.socket_path}")
+                            logger.warning("Socket is active and accepting connections: %s", self.socket_path)
                             test_socket.close()
                         except ConnectionRefusedError:
-                            logger.info(f"Socket exists but is not accepting connections: {self.socket_path}")
+                            logger.info("Socket exists but is not accepting connections: %s", self.socket_path)
                         except Exception as e:
-                            logger.info(f"Socket exists but connection test failed: {e}")
+                            logger.info("Socket exists but connection test failed: %s", e)
                     else:
-                        logger.error(f"Existing file is NOT a socket (mode={oct(mode)}): {self.socket_path}")
+                        logger.error("Existing file is NOT a socket (mode=%s): %s", oct(mode), self.socket_path)
                 except Exception as e:
-                    logger.error(f"Error checking socket file: {e}")
+                    logger.error("Error checking socket file: %s", e)
                 
                 # Check if we can remove the socket file
                 try:
                     if os.access(self.socket_path, os.W_OK):
-                        logger.info(f"We have permission to remove socket file: {self.socket_path}")
+                        logger.info("We have permission to remove socket file: %s", self.socket_path)
                     else:
-                        logger.error(f"No permission to remove socket file: {self.socket_path}")
+                        logger.error("No permission to remove socket file: %s", self.socket_path)
                 except Exception as e:
-                    logger.error(f"Error checking socket file permissions: {e}")
+                    logger.error("Error checking socket file permissions: %s", e)
             else:
-                logger.info(f"Socket file does not exist: {self.socket_path}")
+                logger.info("Socket file does not exist: %s", self.socket_path)
         
         logger.info("Socket diagnostics completed")
 
-    def _process_commands(self):
-        """Process commands from the socket server"""
-        logger.info("Starting command processing loop")
+    def _handle_command(self, conn, data, command=None):
+        """
+        Parse and queue a command received from a client
+        
+        The client is not sent an acknowledgement: it waits for the result,
+        which is sent once the display worker has executed the command.
+        
+        Args:
+            conn: Client connection
+            data: Raw message bytes
+            command: Already decoded command, if the caller parsed it while reading
+        
+        Returns:
+            The reply to send the client, or None if the command was queued
+        """
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Received command: %s", command if command is not None else str(data, 'utf-8', 'replace'))
+        
+        try:
+            if command is None:
+                command = json_loads(data)
+        except (UnicodeDecodeError, json.JSONDecodeError) as e:
+            logger.error("Invalid JSON command: %s", e)
+            logger.error("Raw data: %s", str(data, 'utf-8', 'replace'))
+            return {
+                'status': 'error',
+                'message': f'Invalid JSON data: {str(e)}'
+            }
+        if not isinstance(command, dict):
+            logger.error("Command is a JSON %s, not an object", type(command).__name__)
+            return _RESPONSE_NOT_OBJECT
+        
+        # Check both 'action' and 'command' keys for compatibility
+        cmd_type = command.get('action', command.get('command', 'unknown'))
+        logger.info("Command of type %s received and being queued", cmd_type)
+        
+        # Turn commands away rather than let the backlog grow without bound
+        # while the display is slow
+        if self._outstanding >= MAX_QUEUED_COMMANDS:
+            logger.warning("%s commands already waiting for the display, rejecting %s", self._outstanding, cmd_type)
+            return _RESPONSE_BUSY
+        
+        if cmd_type == 'display_image_shm':
+            # Read the segment now: the client unlinks it once it has a reply
+            try:
+                command = self._read_shared_image(conn, command)
+            except (KeyError, TypeError, ValueError, OSError) as e:
+                logger.error("Could not read shared memory image: %s", e)
+                return {
+                    'status': 'error',
+                    'message': f'Could not read shared memory image: {e}'
+                }
+        
+        if cmd_type == 'display_file':
+            try:
+                command = self._read_image_file(command)
+            except (KeyError, TypeError, ValueError, OSError) as e:
+                logger.error("Could not read image file: %s", e)
+                return {
+                    'status': 'error',
+                    'message': f'Could not read image file: {e}'
+                }
+        
+        # Queue the command for processing; its result is the reply
+        self.command_queue.put((conn, command))
+        self._outstanding += 1
+        return None
+
+    def _read_shared_image(self, conn, command):
+        """
+        Turn a display_image_shm command into a display_image command
+        
+        The client wrote the image into a POSIX shared memory segment and
+        sent only its name and size, so the pixels never travel over the
+        socket. Only segments named the way EInkClient names them and owned
+        by the connected user are accepted, so a client cannot have the
+        service show another program's memory. The pixels are copied out
+        rather than mapped: a segment truncated while mapped would crash
+        the service with SIGBUS.
+        """
+        name = command['shm_name']
+        size = int(command['size'])
+        if not isinstance(name, str) or not _SHM_NAME.match(name):
+            raise ValueError(f"Invalid shared memory name: {name!r}")
+        if not 0 < size <= MAX_FRAME_SIZE:
+            raise ValueError(f"Invalid shared memory size: {size}")
+        if conn.peer_uid is None:
+            raise ValueError("Shared memory images are only accepted over the Unix socket")
+        
+        # Non-blocking, like _read_image_file: a FIFO must not stall the server loop
+        fd = os.open(os.path.join(SHM_DIR, name.lstrip('/')), os.O_RDONLY | os.O_NOFOLLOW | os.O_NONBLOCK)
+        try:
+            st = os.fstat(fd)
+            if not stat.S_ISREG(st.st_mode) or st.st_uid != conn.peer_uid:
+                raise ValueError(f"Shared memory segment {name!r} does not belong to the client")
+            if st.st_size < size:
+                raise ValueError(f"Shared memory segment of {st.st_size} bytes is smaller than {size}")
+            data = _read_fd(fd, size)
+        finally:
+            os.close(fd)
+        
+        command = dict(command, action='display_image', image_bytes=data)
+        del command['shm_name']
+        return command
+
+    def _read_image_file(self, command):
+        """
+        Turn a display_file command into a display_image command
+        
+        The client names an image file on this host instead of sending it.
+        Only files inside the directories listed in EINK_IMAGE_DIRS are
+        accepted. The file is read into a buffer passed on as image_bytes;
+        it is not mapped, since a generator rewriting the file while it was
+        mapped would crash the service with SIGBUS. Like an image frame it
+        may be an encoded image file or raw pixels described by 'mode',
+        'width' and 'height'.
+        """
+        path = os.path.realpath(command['path'])
+        if not any(path.startswith(directory + os.sep) for directory in self.image_dirs):
+            raise ValueError(f"Path is not in an allowed image directory: {command['path']!r}")
+        
+        # Opened without blocking: this runs on the server loop, and opening a
+        # FIFO for reading would otherwise wait for a writer
+        fd = os.open(path, os.O_RDONLY | os.O_NOFOLLOW | os.O_NONBLOCK)
+        try:
+            st = os.fstat(fd)
+            if not stat.S_ISREG(st.st_mode):
+                raise ValueError(f"Not a regular file: {command['path']!r}")
+            size = st.st_size
+            if not 0 < size <= MAX_FRAME_SIZE:
+                raise ValueError(f"Invalid image file size: {size}")
+            data = _read_fd(fd, size)
+        finally:
+            os.close(fd)
+        
+        command = dict(command, action='display_image', image_bytes=data)
+        command.setdefault('image_format', os.path.splitext(path)[1].lstrip('.').lower() or 'png')
+        del command['path']
+        return command
+
+    def _send_response(self, conn, response, framed=False):
+        """Send a single response back to a client without blocking"""
+        self._send_responses(conn, [response], framed)
+
+    def _send_responses(self, conn, responses, framed=False):
+        """
+        Send responses back to a client without blocking
         
-        # Check if socket_server is initialized
-        if self.socket_server is None:
-            logger.error("Socket server is not initialized, command processing loop cannot start")
+        The responses go out together in one sendmsg() call. Whatever the
+        socket does not accept right away is buffered on the connection and
+        written by the server loop once the socket is writable.
+        """
+        if conn.closed:
+            logger.debug("Responses not delivered, client connection is closed: %s", responses)
             return
         
-        # Start a dedicated thread for the command processing loop so we can
-        # return control to the main thread for timeout handling
-        def command_processor():
-            logger.info("Command processor thread started")
-            # Safety timeout to prevent indefinite hanging
-            last_activity_time = time.time()
-            safety_timeout = int(os.environ.get('EINK_SAFETY_TIMEOUT', str(INACTIVITY_TIMEOUT)))
-            
-            try:
-                while not self.stop_event.is_set() and self.initialized:
-                    # Process any queued commands
-                    self._process_queued_commands()
-                    
-                    # Inactivity check
-                    if time.time() - last_activity_time > safety_timeout:
-                        logger.warning(f"No activity for {safety_timeout} seconds, checking system health")
-                        # Just log for now, don't exit
-                        last_activity_time = time.time()  # Reset timer
-                    
-                    # Give the system a short break to prevent CPU hogging
-                    time.sleep(0.01)
-            
-            except Exception as e:
-                logger.error(f"Error in command processing loop: {e}")
-                logger.error(traceback.format_exc())
-                # Mark service as not initialized on error
-                self.initialized = False
-            finally:
-                # Log that we're exiting
-                logger.info("Command processor thread exiting")
-        
-        # Start command processor in a separate thread
-        cmd_thread = threading.Thread(target=command_processor, daemon=True)
-        cmd_thread.start()
-        logger.info("Command processor thread launched, returning to main loop")
-
-    def _handle_command(self, client_socket, data):
-        """Handle a command received from a client"""
+        buffers = [self._encode_response(response, framed) for response in responses]
+        size = sum(len(data) for data in buffers)
+        if conn.pending + size > MAX_PENDING_BYTES:
+            logger.warning("Client is not reading its responses, dropping the connection")
+            conn.closing = True
+            self._close_connection(conn)
+            return
+        
+        conn.outbox.extend(buffers)
+        conn.pending += size
+        if len(conn.outbox) > len(buffers):
+            return  # Already waiting for the socket to become writable
+        
+        # Nothing was queued before, so try to write straight away
         try:
-            # Decode the data
-            message = data.decode('utf-8')
-            logger.debug(f"Received command: {message}")
-            
-            # Parse the JSON message
+            self._write_outbox(conn)
+        except OSError as e:
+            logger.error("Error sending response: %s", e)
+            self._close_connection(conn)
+            return
+        if conn.outbox:
             try:
-                command = json.loads(message)
-            except Exception as e:
-                logger.error(f"Invalid JSON command: {e}")
-                self._send_response(client_socket, {
-                    'status': 'error',
-                    'message': f'Invalid JSON: {str(e)}'
-                })
-                return
-            
-            # Process the command - check both 'action' and 'command' keys for compatibility
-            cmd_type = command.get('action', command.get('command', 'unknown'))
-            logger.info(f"Command of type {cmd_type} received and being queued")
-            
-            # Queue the command for processing
-            self.command_queue.append((client_socket, command))
-            
-            # Acknowledge receipt of the command
-            self._send_response(client_socket, {
-                'status': 'queued',
-                'message': f'Command accepted'
-            })
-            
-        except Exception as e:
-            logger.error(f"Error handling command: {e}")
-            logger.error(traceback.format_exc())
+                self._selector.modify(conn.sock, selectors.EVENT_WRITE, conn)
+            except KeyError:
+                # No longer watched for reading after the client stopped sending
+                self._selector.register(conn.sock, selectors.EVENT_WRITE, conn)
+
+    def _process_queued_commands(self):
+        """Drain the command queue and hand the whole batch to the display worker"""
+        batch = []
+        while True:
             try:
-                self._send_response(client_socket, {
-                    'status': 'error',
-                    'message': f'Error handling command: {str(e)}'
-                })
-            except:
-                pass
+                batch.append(self.command_queue.get_nowait())
+            except queue.Empty:
+                break
+        
+        if batch:
+            self._display_exec.submit(self._execute_batch, batch)
 
-    def _send_response(self, client_socket, response):
-        """Send a response back to a client"""
+    def _execute_batch(self, batch):
+        """Execute a batch of queued commands in order on the display worker"""
+        results = []
+        index = 0
+        while index < len(batch):
+            conn, command = batch[index]
+            index += 1
+            if index < len(batch) and self._is_superseded_clear(conn, command, *batch[index]):
+                draw_conn, draw = batch[index]
+                index += 1
+                clear_result, draw_result = self._execute_clear_and_draw(command, draw)
+                results.append((conn, clear_result))
+                results.append((draw_conn, draw_result))
+            else:
+                results.append((conn, self._execute_queued(command)))
+        
+        # Sockets belong to the server loop, so let it send the results
+        self._finished.extend(results)
+        self._wake_server()
+
+    def _execute_queued(self, command):
+        """Execute a queued command, turning any exception into an error reply"""
         try:
-            message = json.dumps(response).encode('utf-8')
-            client_socket.sendall(message)
+            return self._execute_command(command)
         except Exception as e:
-            logger.error(f"Error sending response: {e}")
+            logger.error("Error processing queued command: %s", e, exc_info=logger.isEnabledFor(logging.DEBUG))
+            return {
+                'status': 'error',
+                'message': str(e)
+            }
 
-    def _process_queued_commands(self):
-        """Process commands in the queue"""
-        while self.command_queue:
-            try:
-                with self.lock:
-                    client_socket, command = self.command_queue.pop(0)
-                
-                result = self._execute_command(command)
-                
-                # Send the result back to the client
-                self._send_response(client_socket, result)
-                
-            except Exception as e:
-                logger.error(f"Error processing queued command: {e}")
-                logger.error(traceback.format_exc())
+    def _execute_clear_and_draw(self, clear, draw):
+        """
+        Execute a clear and the full 4-gray redraw that directly follows it
+        
+        The redraw replaces the whole frame, so the clear only costs a
+        refresh: it is run only if the redraw fails, leaving the display
+        blank as the two commands would have. The redraw is never answered
+        from the content cache, since the display would have been cleared.
+        
+        Returns:
+            Tuple of (clear result, draw result)
+        """
+        self._shown_content = None
+        draw_result = self._execute_queued(draw)
+        if draw_result is _RESPONSE_NOT_INITIALIZED or (
+                isinstance(draw_result, dict) and draw_result.get('status') == 'error'):
+            return self._execute_queued(clear), draw_result
+        logger.info("Skipping clear command, the next command redrew the whole display")
+        return _RESPONSE_CLEARED, draw_result
+
+    def _send_finished_results(self):
+        """Send the results the display worker has posted back"""
+        while self._finished:
+            conn, result = self._finished.popleft()
+            self._outstanding -= 1
+            if conn.closed:
+                logger.debug("Result not delivered, client connection is closed: %s", result)
+                continue
+            # A connection's commands finish in order, so this is its first pending reply
+            conn.replies[conn.replies.index(None)] = result
+            self._send_ready_replies(conn)
+
+    def _is_superseded_clear(self, conn, command, next_conn, next_command):
+        """
+        Check whether a clear is directly followed by a full redraw from the same client
+        
+        A fast_refresh redraw uses the black-and-white waveform, which leaves
+        ghosting behind; the clear before it is what removes it, so it runs.
+        """
+        return (
+            next_conn is conn
+            and command.get('action', command.get('command')) == 'clear'
+            and next_command.get('action', next_command.get('command')) in _DRAW_ACTIONS
+            and not next_command.get('fast_refresh')
+        )
 
     def _execute_command(self, command):
         """Execute a display command"""
         if not self.initialized:
+            return _RESPONSE_NOT_INITIALIZED
+        
+        # Check for both 'action' and 'command' keys for compatibility
+        action = command.get('action', command.get('command'))
+        
+        logger.info("Executing command: %s with args: %s", action, command)
+        
+        handler = self._actions.get(action)
+        if handler is None:
+            logger.warning("Unknown action requested: %s", action)
             return {
                 'status': 'error',
-                'message': 'Display not initialized'
+                'message': f'Unknown action: {action}'
             }
         
-        # Check for both 'action' and 'command' keys for compatibility
-        action = command.get('action', command.get('command'))
+        # A refresh takes seconds, so redrawing what is already shown is skipped
+        content_key = None
+        if action in _DRAW_ACTIONS:
+            content_key = self._content_key(command)
+            if content_key is not None and content_key == self._shown_content:
+                logger.info("Display already shows the content of this %s command, skipping it", action)
+                return _RESPONSE_UNCHANGED
+        
+        try:
+            result = handler(command)
+        except Exception as e:
+            logger.error("Error executing command %s: %s", action, e, exc_info=logger.isEnabledFor(logging.DEBUG))
+            self._shown_content = None
+            return {
+                'status': 'error',
+                'message': f'Error executing {action}: {str(e)}'
+            }
+        
+        # Anything but a successful draw or a status query leaves the panel
+        # in an unknown state (sleep and wake re-initialize it)
+        if action != 'status':
+            failed = isinstance(result, dict) and result.get('status') == 'error'
+            self._shown_content = None if failed else content_key
+        return result
+    
+    @staticmethod
+    def _content_key(command):
+        """
+        Digest identifying what a drawing command puts on the display
+        
+        Covers every field of the command and the image bytes, if any. The
+        fields are hashed as canonical JSON: keys sorted and display_text
+        defaults filled in, so the same text sent as JSON or as a compact
+        command, or with its fields in another order, gets the same digest.
+        Returns None for commands that must always reach the display.
+        """
+        if command.get('force_full_refresh'):
+            return None
+        fields = {key: value for key, value in command.items() if key != 'image_bytes'}
+        if command.get('action', command.get('command')) == 'display_text':
+            fields = dict(_TEXT_DEFAULTS, **fields)
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(json_dumps(fields, sort_keys=True))
+        image_bytes = command.get('image_bytes')
+        if image_bytes is not None:
+            digest.update(image_bytes)
+        return digest.digest()
+
+    def _do_clear(self, command):
+        """Clear the display"""
+        logger.info("Executing CLEAR display command")
+        self.display.Clear()
+        logger.info("Display clear command completed successfully")
+        return _RESPONSE_CLEARED
+
+    def _do_display_text(self, command):
+        """Draw text on the display"""
+        text = command.get('text', '')
+        x = command.get('x', 10)
+        y = command.get('y', 10)
+        font_size = command.get('font_size', 24)
+        text_color = command.get('text_color', 'black')
+        background_color = command.get('background_color', 'white')
+        
+        logger.info("Executing DISPLAY_TEXT command: '%s' at (%s,%s) with font_size=%s, text_color=%s, bg_color=%s", text, x, y, font_size, text_color, background_color)
+        
+        if self._display_text is not None:
+            if command.get('fast_refresh'):
+                self._display_text(text, x, y, font_size, text_color, background_color, fast_refresh=True)
+            else:
+                self._display_text(text, x, y, font_size, text_color, background_color)
+            logger.info("Display text command completed successfully")
+        else:
+            # Fallback for displays without display_text method
+            logger.warning("Display lacks display_text method, using mock implementation")
+            # Mock implementation or return an error
+            return {
+                'status': 'error',
+                'message': 'Display does not support text display'
+            }
+        
+        return {
+            'status': 'success',
+            'message': f'Displayed text: {text}'
+        }
+
+    def _do_display_image(self, command):
+        """Show an image sent by the client"""
+        # Get image data from command: raw bytes from an image frame,
+        # or base64 inside JSON from older clients
+        image_bytes = command.get('image_bytes')
+        image_data_b64 = command.get('image_data')
+        image_format = command.get('image_format', 'png')
         
-        logger.info(f"Executing command: {action} with args: {command}")
+        if image_bytes is None and not image_data_b64:
+            logger.error("No image data provided in display_image command")
+            return {
+                'status': 'error',
+                'message': 'No image data provided'
+            }
         
         try:
-            if action == 'clear':
-                logger.info("Executing CLEAR display command")
-                self.display.Clear()
-                logger.info("Display clear command completed successfully")
-                return {
-                    'status': 'success',
-                    'message': 'Display cleared'
-                }
-                
-            elif action == 'display_text':
-                text = command.get('text', '')
-                x = command.get('x', 10)
-                y = command.get('y', 10)
-                font_size = command.get('font_size', 24)
-                text_color = command.get('text_color', 'black')
-                background_color = command.get('background_color', 'white')
-                
-                logger.info(f"Executing DISPLAY_TEXT command: '{text}' at ({x},{y}) with font_size={font_size}, text_color={text_color}, bg_color={background_color}")
-                
-                if hasattr(self.display, 'display_text'):
-                    self.display.display_text(text, x, y, font_size, text_color, background_color)
-                    logger.info("Display text command completed successfully")
+            from PIL import Image, ImageOps
+            import io
+            
+            if image_bytes is not None and 'mode' in command:
+                # Raw pixels need no decoding at all
+                size = (command['width'], command['height'])
+                logger.debug("Loading raw %s pixels of size %s", command['mode'], size)
+                image = Image.frombytes(command['mode'], size, image_bytes)
+            else:
+                if image_bytes is not None:
+                    image_data = image_bytes
                 else:
-                    # Fallback for displays without display_text method
-                    logger.warning("Display lacks display_text method, using mock implementation")
-                    # Mock implementation or return an error
-                    return {
-                        'status': 'error',
-                        'message': 'Display does not support text display'
-                    }
-                
-                return {
-                    'status': 'success',
-                    'message': f'Displayed text: {text}'
-                }
-                
-            elif action == 'display_image':
-                # Get image data from command
-                image_data_b64 = command.get('image_data')
-                image_format = command.get('image_format', 'png')
-                
-                if not image_data_b64:
-                    logger.error("No image data provided in display_image command")
-                    return {
-                        'status': 'error',
-                        'message': 'No image data provided'
-                    }
-                
-                try:
                     # Decode base64 image data
-                    logger.debug(f"Decoding base64 image data (length: {len(image_data_b64)})")
+                    logger.debug("Decoding base64 image data (length: %s)", len(image_data_b64))
                     image_data = base64.b64decode(image_data_b64)
-                    logger.debug(f"Decoded image data size: {len(image_data)} bytes")
-                    
-                    # Convert to PIL Image
-                    from PIL import Image, ImageOps
-                    import io
-                    logger.debug(f"Opening image from bytes with format: {image_format}")
-                    
-                    # For debugging, save the raw decoded data to a file
+                logger.debug("Image data size: %s bytes", len(image_data))
+                
+                # Convert to PIL Image
+                logger.debug("Opening image from bytes with format: %s", image_format)
+                
+                # For debugging, save the raw decoded data to a file
+                if logger.isEnabledFor(logging.DEBUG):
                     debug_path = '/tmp/eink_debug_raw.bin'
                     with open(debug_path, 'wb') as f:
                         f.write(image_data)
-                    logger.debug(f"Saved raw decoded data to {debug_path}")
-                    
-                    # Open the image from the byte stream
-                    image = Image.open(io.BytesIO(image_data))
-                    
-                    # Save the image as received to a debug file
-                    debug_image_path = f'/tmp/eink_debug_image.{image_format}'
-                    image.save(debug_image_path)
-                    logger.debug(f"Saved debug image to {debug_image_path}")
-                    
-                    logger.info(f"Image decoded successfully: format={image.format}, mode={image.mode}, size={image.size}")
-                    
-                    # Convert to grayscale if needed
-                    if image.mode != 'L':
-                        logger.info(f"Converting image from {image.mode} to grayscale")
-                        image = ImageOps.grayscale(image)
-                    
-                    # Get the display dimensions
-                    display_width = 280  # Default Waveshare 3.7" width
-                    display_height = 480 # Default Waveshare 3.7" height
-                    
-                    # Get actual dimensions if available from the driver
-                    if hasattr(self.display, 'width') and hasattr(self.display, 'height'):
-                        display_width = self.display.width
-                        display_height = self.display.height
-                        logger.info(f"Using display dimensions from driver: {display_width}x{display_height}")
-                    
-                    # Resize image to fit the display if needed
-                    if image.size[0] != display_width or image.size[1] != display_height:
-                        logger.info(f"Resizing image from {image.size} to {display_width}x{display_height}")
-                        image = image.resize((display_width, display_height))
-                    
-                    # Save the processed image for debug purposes
-                    debug_processed_path = '/tmp/eink_debug_processed.png'
-                    image.save(debug_processed_path)
-                    logger.debug(f"Saved processed image to {debug_processed_path}")
-                    
-                    # Check if it's time for a full refresh
-                    needs_full_refresh = False
-                    force_full_refresh = command.get('force_full_refresh', False)
-                    
-                    if force_full_refresh:
-                        needs_full_refresh = True
-                        logger.info("Forcing full refresh as requested")
-                        self.update_counter = 0
-                    elif self.full_refresh_interval > 0:
-                        self.update_counter += 1
-                        if self.update_counter >= self.full_refresh_interval:
-                            needs_full_refresh = True
-                            self.update_counter = 0
-                            logger.info(f"Performing full refresh after {self.full_refresh_interval} updates")
-                    
-                    # Perform full refresh if needed
-                    if needs_full_refresh and hasattr(self.display, 'Clear') and self.clear_on_full_refresh:
-                        logger.info("Clearing display for full refresh")
-                        self.display.Clear()
-                        # Small delay to allow the clear to complete
-                        time.sleep(0.5)
-                    
-                    logger.info(f"Executing DISPLAY_IMAGE command with image format: {image_format}, size: {image.size}")
-                    
-                    # Check if display supports display_file method (for file paths)
-                    if 'image_path' in command and hasattr(self.display, 'display_file'):
-                        image_path = command.get('image_path')
-                        resize = command.get('resize', True)
-                        logger.info(f"Using display_file method with path: {image_path}, resize: {resize}")
-                        self.display.display_file(image_path, resize=resize)
-                    # Otherwise use display_image method
-                    elif hasattr(self.display, 'display_image'):
-                        logger.info("Using display_image method")
-                        self.display.display_image(image)
-                        
-                        # Explicitly call driver refresh to ensure update
-                        if hasattr(self.display, 'refresh'):
-                            logger.info("Explicitly calling refresh method")
-                            self.display.refresh(0 if needs_full_refresh else 1)
-                    else:
-                        # Fallback for displays without display_image method
-                        logger.warning("Display lacks display_image method, using mock implementation")
-                        # Mock implementation or return an error
-                        return {
-                            'status': 'error',
-                            'message': 'Display does not support image display'
-                        }
-                    
-                    logger.info("Display image command completed successfully")
-                    return {
-                        'status': 'success',
-                        'message': 'Image displayed successfully',
-                        'full_refresh': needs_full_refresh
-                    }
-                    
-                except Exception as e:
-                    logger.error(f"Error processing image data: {e}")
-                    logger.error(traceback.format_exc())
-                    return {
-                        'status': 'error',
-                        'message': f'Error processing image: {str(e)}'
-                    }
-                
-            elif action == 'sleep':
-                logger.info("Executing SLEEP display command")
-                self.display.sleep()
-                logger.info("Display sleep command completed successfully")
-                return {
-                    'status': 'success',
-                    'message': 'Display put to sleep'
-                }
+                    logger.debug("Saved raw decoded data to %s", debug_path)
                 
-            elif action == 'wake':
-                logger.info("Executing WAKE display command")
-                self.display.init()
-                logger.info("Display wake command completed successfully")
-                return {
-                    'status': 'success',
-                    'message': 'Display woken up'
-                }
+                # Open the image from the byte stream
+                image = Image.open(io.BytesIO(image_data))
                 
-            elif action == 'status':
-                logger.info("Executing STATUS command")
-                return {
-                    'status': 'success',
-                    'initialized': self.initialized,
-                    'mock_mode': self.mock_mode,
-                    'display_type': type(self.display).__name__ if self.display else None
-                }
+                # Save the image as received to a debug file
+                if logger.isEnabledFor(logging.DEBUG):
+                    debug_image_path = f'/tmp/eink_debug_image.{image_format}'
+                    image.save(debug_image_path)
+                    logger.debug("Saved debug image to %s", debug_image_path)
             
-            elif action == 'debug':
-                request_type = command.get('request')
-                logger.info(f"Executing DEBUG command: {request_type}")
-                
-                # Check if we have debug handlers registered
-                if hasattr(self, '_debug_command_handlers') and request_type in self._debug_command_handlers:
-                    handler = self._debug_command_handlers[request_type]
-                    result = handler(self, command)
-                    logger.info(f"Debug command completed with result: {result}")
-                    return result
-                else:
-                    return {
-                        'status': 'error',
-                        'message': f'Unknown debug request: {request_type}'
-                    }
+            logger.info("Image decoded successfully: format=%s, mode=%s, size=%s", image.format, image.mode, image.size)
+            
+            # Convert to grayscale if needed
+            if image.mode != 'L':
+                logger.info("Converting image from %s to grayscale", image.mode)
+                image = ImageOps.grayscale(image)
+            
+            # Get the display dimensions
+            display_width, display_height = self._display_size
+            
+            # Resize image to fit the display if needed
+            if image.size[0] != display_width or image.size[1] != display_height:
+                logger.info("Resizing image from %s to %sx%s", image.size, display_width, display_height)
+                image = image.resize((display_width, display_height))
+            
+            # Save the processed image for debug purposes; encoding a PNG
+            # for every frame is not worth it otherwise
+            if logger.isEnabledFor(logging.DEBUG):
+                debug_processed_path = '/tmp/eink_debug_processed.png'
+                image.save(debug_processed_path)
+                logger.debug("Saved processed image to %s", debug_processed_path)
+            
+            # Check if it's time for a full refresh
+            needs_full_refresh = False
+            force_full_refresh = command.get('force_full_refresh', False)
+            
+            if force_full_refresh:
+                needs_full_refresh = True
+                logger.info("Forcing full refresh as requested")
+                self.update_counter = 0
+            elif self.full_refresh_interval > 0:
+                self.update_counter += 1
+                if self.update_counter >= self.full_refresh_interval:
+                    needs_full_refresh = True
+                    self.update_counter = 0
+                    logger.info("Performing full refresh after %s updates", self.full_refresh_interval)
+            
+            # Perform full refresh if needed
+            if needs_full_refresh and self._display_clear is not None and self.clear_on_full_refresh:
+                logger.info("Clearing display for full refresh")
+                self._display_clear()
+                # Small delay to allow the clear to complete
+                time.sleep(0.5)
+            
+            logger.info("Executing DISPLAY_IMAGE command with image format: %s, size: %s", image_format, image.size)
+            
+            # Check if display supports display_file method (for file paths)
+            if 'image_path' in command and self._display_file is not None:
+                image_path = command.get('image_path')
+                resize = command.get('resize', True)
+                logger.info("Using display_file method with path: %s, resize: %s", image_path, resize)
+                self._display_file(image_path, resize=resize)
+            # Otherwise use display_image method
+            elif self._display_image is not None:
+                logger.info("Using display_image method")
+                self._display_image(image)
                 
+                # Explicitly call driver refresh to ensure update
+                if self._display_refresh is not None:
+                    logger.info("Explicitly calling refresh method")
+                    self._display_refresh(0 if needs_full_refresh else 1)
             else:
-                logger.warning(f"Unknown action requested: {action}")
+                # Fallback for displays without display_image method
+                logger.warning("Display lacks display_image method, using mock implementation")
+                # Mock implementation or return an error
                 return {
                     'status': 'error',
-                    'message': f'Unknown action: {action}'
+                    'message': 'Display does not support image display'
                 }
-                
+            
+            logger.info("Display image command completed successfully")
+            return {
+                'status': 'success',
+                'message': 'Image displayed successfully',
+                'full_refresh': needs_full_refresh
+            }
+            
         except Exception as e:
-            logger.error(f"Error executing command {action}: {e}")
-            logger.error(traceback.format_exc())
+            logger.error("Error processing image data: %s", e, exc_info=logger.isEnabledFor(logging.DEBUG))
             return {
                 'status': 'error',
-                'message': f'Error executing {action}: {str(e)}'
+                'message': f'Error processing image: {str(e)}'
+            }
+
+    def _do_sleep(self, command):
+        """Put the display to sleep"""
+        logger.info("Executing SLEEP display command")
+        self.display.sleep()
+        logger.info("Display sleep command completed successfully")
+        return _RESPONSE_SLEEPING
+
+    def _do_wake(self, command):
+        """Wake the display up"""
+        logger.info("Executing WAKE display command")
+        self.display.init()
+        logger.info("Display wake command completed successfully")
+        return _RESPONSE_AWAKE
+
+    def _do_status(self, command):
+        """Report the service status"""
+        logger.info("Executing STATUS command")
+        return self._status_responses[self.initialized]
+
+    def _do_debug(self, command):
+        """Run a registered debug handler"""
+        request_type = command.get('request')
+        logger.info("Executing DEBUG command: %s", request_type)
+        
+        # Check if we have debug handlers registered
+        if request_type in self._debug_command_handlers:
+            handler = self._debug_command_handlers[request_type]
+            result = handler(self, command)
+            logger.info("Debug command completed with result: %s", result)
+            return result
+        else:
+            return {
+                'status': 'error',
+                'message': f'Unknown debug request: {request_type}'
             }
 
     def cleanup(self):
@@ -1201,7 +1831,7 @@ class EInkService:
         # First, handle socket resources if they exist
         try:
             # Handle socket server if it exists
-            if hasattr(self, 'socket_server') and self.socket_server:
+            if self.socket_server is not None:
                 logger.info("Closing socket server")
                 try:
                     # In case the socket is hanging
@@ -1209,60 +1839,41 @@ class EInkService:
                         try:
                             self.socket_server.socket.shutdown(socket.SHUT_RDWR)
                         except Exception as e:
-                            logger.warning(f"Error shutting down socket: {e}")
+                            logger.warning("Error shutting down socket: %s", e)
                     
                     # Explicit close with additional handling
                     try:
                         fd = self.socket_server.fileno()
-                        logger.debug(f"Socket file descriptor: {fd}")
+                        logger.debug("Socket file descriptor: %s", fd)
                         self.socket_server.close()
                         logger.info("Socket server closed successfully")
                         try:
                             # Try to close the file descriptor directly
                             os.close(fd)
-                            logger.debug(f"Closed file descriptor {fd}")
+                            logger.debug("Closed file descriptor %s", fd)
                         except OSError:
                             pass  # Already closed
                     except Exception as e:
-                        logger.error(f"Error closing socket server: {e}")
+                        logger.error("Error closing socket server: %s", e)
                 except Exception as e:
-                    logger.error(f"Error during socket server shutdown: {e}")
+                    logger.error("Error during socket server shutdown: %s", e)
             
             # Clean up socket file if it exists and we're using Unix sockets
-            if hasattr(self, 'socket_path') and self.socket_path and os.path.exists(self.socket_path):
-                logger.info(f"Removing socket file: {self.socket_path}")
+            if self.socket_path:
                 try:
-                    # Check if it's actually a socket
-                    try:
-                        mode = os.stat(self.socket_path).st_mode
-                        is_socket = stat.S_ISSOCK(mode)
-                        if not is_socket:
-                            logger.warning(f"File at {self.socket_path} is not a socket (mode={oct(mode)}), but removing anyway")
-                    except Exception as e:
-                        logger.warning(f"Error checking socket file type: {e}")
-                    
-                    # Force remove the file
                     os.unlink(self.socket_path)
-                    logger.info("Socket file removed successfully")
-                    
-                    # Verify removal
-                    if os.path.exists(self.socket_path):
-                        logger.error(f"Socket file still exists at {self.socket_path} after removal attempt")
-                        # Try one more time with force
-                        try:
-                            os.remove(self.socket_path)
-                            logger.info("Socket file removed on second attempt")
-                        except Exception as e2:
-                            logger.error(f"Failed to remove socket file on second attempt: {e2}")
-                except Exception as e:
-                    logger.error(f"Error removing socket file: {e}")
+                    logger.info("Removed socket file: %s", self.socket_path)
+                except FileNotFoundError:
+                    pass
+                except OSError as e:
+                    logger.error("Error removing socket file: %s", e)
         except Exception as e:
-            logger.error(f"Error during socket cleanup: {e}")
+            logger.error("Error during socket cleanup: %s", e)
 
         # Then, handle display/eink resources
         try:
             # Try to clean up display if it exists
-            if hasattr(self, 'display') and self.display:
+            if self.display is not None:
                 logger.info("Cleaning up display resources")
                 try:
                     if hasattr(self.display, 'module_exit'):
@@ -1275,10 +1886,10 @@ class EInkService:
                         self.display.cleanup()
                         logger.info("Display cleanup called successfully")
                 except Exception as e:
-                    logger.error(f"Error cleaning up display resources: {e}")
+                    logger.error("Error cleaning up display resources: %s", e)
             
             # Try to clean up eink if it exists and is different from display
-            if hasattr(self, 'eink') and self.eink and self.eink != self.display:
+            if self.eink is not None and self.eink is not self.display:
                 logger.info("Cleaning up eink resources")
                 try:
                     if hasattr(self.eink, 'module_exit'):
@@ -1291,7 +1902,7 @@ class EInkService:
                         self.eink.cleanup()
                         logger.info("Eink cleanup called successfully")
                 except Exception as e:
-                    logger.error(f"Error cleaning up eink resources: {e}")
+                    logger.error("Error cleaning up eink resources: %s", e)
                 
             # Try to clean up RPi.GPIO if it was imported
             try:
@@ -1300,21 +1911,22 @@ class EInkService:
                 GPIO.cleanup()
                 logger.info("GPIO resources cleaned up successfully")
             except (ImportError, RuntimeError) as e:
-                logger.debug(f"No GPIO cleanup needed: {e}")
+                logger.debug("No GPIO cleanup needed: %s", e)
             except Exception as e:
-                logger.error(f"Error cleaning up GPIO: {e}")
+                logger.error("Error cleaning up GPIO: %s", e)
             
         except Exception as e:
-            logger.error(f"Error during display/eink cleanup: {e}")
+            logger.error("Error during display/eink cleanup: %s", e)
         
         # Remove PID file if it exists
-        try:
-            if self.pid_path and os.path.exists(self.pid_path):
-                logger.info(f"Removing PID file: {self.pid_path}")
+        if self.pid_path:
+            try:
                 os.unlink(self.pid_path)
-                logger.info("PID file removed successfully")
-        except Exception as e:
-            logger.error(f"Error removing PID file: {e}")
+                logger.info("Removed PID file: %s", self.pid_path)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logger.error("Error removing PID file: %s", e)
         
         # Mark service as not initialized
         self.initialized = False
@@ -1322,151 +1934,181 @@ class EInkService:
 
     def _initialize_display(self) -> bool:
         """
-        Initialize the e-ink display with retry logic
+        Initialize the e-ink display, falling back to the mock driver
+        
+        The hardware driver is tried first (unless mock mode was requested),
+        with up to max_init_retries attempts; if it cannot be brought up the
+        mock driver is initialized once instead.
         
         Returns:
             bool: Success or failure
         """
-        # Determine which display driver to use
-        display_type = os.environ.get('EINK_DISPLAY_TYPE', 'waveshare_3in7').lower()
-        
-        # Use mock mode if specified
-        if self.mock_mode:
-            logger.info("Using mock e-ink display driver")
-            try:
-                self.display = MockEPD()
-                self.display.init()
-                
-                # Set up backward compatibility wrapper
-                class EinkWrapper:
-                    def __init__(self, display):
-                        self.driver = display
-                    
-                    def initialize(self):
-                        if hasattr(self.driver, 'init'):
-                            return self.driver.init()
-                        return None
-                
-                self.eink = EinkWrapper(self.display)
-                
-                self.initialized = True
-                logger.info("Mock display initialized successfully")
-                return True
-            except Exception as e:
-                logger.error(f"Failed to initialize mock display: {e}")
+        if not self.mock_mode:
+            if self._initialize_hardware_display():
+                return self._display_ready()
+            if self.stop_event.is_set():
                 return False
+            logger.info("Falling back to mock display mode after hardware initialization failure")
+            self.mock_mode = True
+        
+        logger.info("Using mock e-ink display driver")
+        try:
+            self.display = MockEPD()
+            self.display.init()
+        except Exception as e:
+            logger.error("Failed to initialize mock display: %s", e)
+            self.display = None
+            return False
+        logger.info("Mock display initialized successfully")
+        return self._display_ready()
+    
+    def _display_ready(self) -> bool:
+        """Finish setting up once self.display has been initialized"""
+        # Set up backward compatibility wrapper
+        self.eink = _EinkWrapper(self.display)
+        
+        # Resolve the optional driver methods once rather than probing the
+        # display with hasattr() on every command
+        display = self.display
+        self._display_text = getattr(display, 'display_text', None)
+        self._display_image = getattr(display, 'display_image', None)
+        self._display_file = getattr(display, 'display_file', None)
+        self._display_refresh = getattr(display, 'refresh', None)
+        self._display_clear = getattr(display, 'Clear', None)
+        width, height = getattr(display, 'width', None), getattr(display, 'height', None)
+        if width and height:
+            self._display_size = (width, height)
+        
+        self.initialized = True
+        return True
+    
+    def _initialize_hardware_display(self) -> bool:
+        """
+        Bring up the hardware display driver with retry logic
+        
+        Processes holding the GPIO chip are killed (when EINK_FORCE_KILL_GPIO
+        is set) before the first attempt and at most once more after a failed
+        attempt, not after every one. The wait between attempts starts short
+        and doubles up to RETRY_DELAY, and an error retrying cannot fix ends
+        the attempts at once. The first failure is logged with its
+        traceback, later ones as a single line.
         
+        Returns:
+            bool: True if self.display is initialized
+        """
         # Check GPIO permissions before attempting to initialize
         gpio_available, message = self._check_gpio_availability()
-        logger.info(f"GPIO availability check: {message}")
+        logger.info("GPIO availability check: %s", message)
         
-        if not gpio_available:
-            # Try to free GPIO resources if needed
-            if self.force_kill_gpio:
-                kill_success, kill_message = self._kill_gpio_processes()
-                logger.info(f"Attempted to free GPIO resources: {kill_message}")
-                
-                # Check again after cleanup
-                gpio_available, message = self._check_gpio_availability()
-                logger.info(f"GPIO availability after cleanup: {message}")
-                
-                if not gpio_available and not self.mock_mode:
-                    logger.warning("GPIO resources still unavailable, switching to mock mode")
-                    self.mock_mode = True
-                    return self._initialize_display()  # Retry with mock mode
+        killed = False
+        if not gpio_available and self.force_kill_gpio:
+            # Try to free GPIO resources
+            kill_success, kill_message = self._kill_gpio_processes()
+            logger.info("Attempted to free GPIO resources: %s", kill_message)
+            killed = True
+            
+            # Check again after cleanup
+            gpio_available, message = self._check_gpio_availability()
+            logger.info("GPIO availability after cleanup: %s", message)
+            
+            if not gpio_available:
+                logger.warning("GPIO resources still unavailable, switching to mock mode")
+                return False
         
         # Try to set GPIO permissions if running as root
+        if os.geteuid() == 0:  # Running as root
+            logger.info("Running as root, ensuring GPIO permissions are set")
+            for device in ('/dev/gpiomem', GPIO_CHIP_PATH):
+                # Same as chmod a+rw, without starting a process for it
+                try:
+                    os.chmod(device, stat.S_IMODE(os.stat(device).st_mode) | 0o666)
+                except FileNotFoundError:
+                    logger.debug("%s does not exist, not changing its permissions", device)
+                except OSError as e:
+                    logger.warning("Failed to set GPIO permissions on %s: %s", device, e)
+        
+        # Attempt to use legacy GPIO access by importing RPi.GPIO first; the
+        # mode only needs to be set once, not on every attempt
         try:
-            if os.geteuid() == 0:  # Running as root
-                logger.info("Running as root, ensuring GPIO permissions are set")
-                subprocess.run(['chmod', 'a+rw', '/dev/gpiomem'], 
-                             stdout=subprocess.PIPE, 
-                             stderr=subprocess.PIPE)
-                subprocess.run(['chmod', 'a+rw', '/dev/gpiochip0'], 
-                             stdout=subprocess.PIPE, 
-                             stderr=subprocess.PIPE)
+            import RPi.GPIO as GPIO
+            GPIO.setmode(GPIO.BCM)
+            GPIO.setwarnings(False)
+            logger.info("Successfully imported and configured RPi.GPIO")
+        except ImportError:
+            logger.warning("Could not import RPi.GPIO, will rely on driver's GPIO handling")
         except Exception as e:
-            logger.warning(f"Failed to set GPIO permissions: {e}")
+            logger.warning("Error configuring GPIO: %s", e)
+        
+        # Imported here rather than at module level; retrying cannot fix a
+        # driver that does not import
+        try:
+            from devices.eink.drivers.waveshare_3in7 import Driver
+        except ImportError as e:
+            logger.error("Could not import the 3.7in display driver: %s", e)
+            return False
         
         # Retry logic for hardware display
+        delay = INITIAL_RETRY_DELAY
         for attempt in range(self.max_init_retries):
             try:
-                logger.info(f"Initializing display (attempt {attempt+1}/{self.max_init_retries})...")
-                
-                # Attempt to use legacy GPIO access by importing RPi.GPIO first
-                try:
-                    import RPi.GPIO as GPIO
-                    GPIO.setmode(GPIO.BCM)
-                    GPIO.setwarnings(False)
-                    logger.info("Successfully imported and configured RPi.GPIO")
-                except ImportError:
-                    logger.warning("Could not import RPi.GPIO, will rely on driver's GPIO handling")
-                except Exception as e:
-                    logger.warning(f"Error configuring GPIO: {e}")
-                
-                # Use the Driver class instead of directly using WaveshareEPD3in7
-                try:
-                    from devices.eink.drivers.waveshare_3in7 import Driver
-                    self.display = Driver()
-                    logger.info("Successfully created Driver instance")
-                except ImportError:
-                    logger.warning("Could not import Driver class, falling back to direct WaveshareEPD3in7 usage")
-                    # Directly use the WaveshareEPD3in7 class as fallback
-                    self.display = WaveshareEPD3in7()
+                logger.info("Initializing display (attempt %s/%s)...", attempt+1, self.max_init_retries)
+                self.display = Driver()
+                logger.info("Successfully created Driver instance")
                 
                 # Test display to confirm it works
                 self.display.init()
                 self.display.Clear()
                 
-                # Set up backward compatibility wrapper
-                class EinkWrapper:
-                    def __init__(self, display):
-                        self.driver = display
-                    
-                    def initialize(self):
-                        if hasattr(self.driver, 'init'):
-                            return self.driver.init()
-                        return None
-                
-                self.eink = EinkWrapper(self.display)
-                
                 logger.info("Display initialized successfully")
-                self.initialized = True
                 return True
                 
             except Exception as e:
-                logger.error(f"Failed to initialize display (attempt {attempt+1}): {e}")
-                logger.error(traceback.format_exc())
+                if attempt == 0:
+                    logger.exception("Failed to initialize display (attempt %s): %s", attempt+1, e)
+                else:
+                    logger.error("Failed to initialize display (attempt %s): %s", attempt+1, e)
                 
-                # Try to free GPIO resources if force_kill_gpio is enabled
-                if self.force_kill_gpio:
-                    kill_success, kill_message = self._kill_gpio_processes()
-                    logger.info(f"Attempted to free GPIO resources: {kill_message}")
-                    
-                # Clean up any partial initialization
-                try:
-                    if hasattr(self, 'display') and self.display is not None:
-                        self.display.close()
-                except:
-                    pass
+                # Clean up any partial initialization; dropping the reference
+                # first means it is never closed twice
+                display, self.display = self.display, None
+                if display is not None:
+                    try:
+                        display.close()
+                    except Exception as close_error:
+                        logger.debug("Closing partially initialized display failed: %s", close_error)
                 
-                self.display = None
+                if not self._is_transient_init_error(e):
+                    logger.error("Display initialization failed with an error retrying cannot fix")
+                    return False
+                
+                # Try to free GPIO resources once if force_kill_gpio is enabled
+                if self.force_kill_gpio and not killed:
+                    kill_success, kill_message = self._kill_gpio_processes()
+                    logger.info("Attempted to free GPIO resources: %s", kill_message)
+                    killed = True
                 
-                # Wait before retry (skip delay on last attempt)
+                # Wait before retry (skip delay on last attempt), unless asked to stop
                 if attempt < self.max_init_retries - 1:
-                    logger.info(f"Waiting {RETRY_DELAY}s before retry...")
-                    time.sleep(RETRY_DELAY)
+                    logger.info("Waiting %.1fs before retry...", delay)
+                    if self.stop_event.wait(delay):
+                        logger.info("Stop requested, giving up display initialization")
+                        return False
+                    delay = min(delay * 2, RETRY_DELAY)
 
-        logger.error(f"Failed to initialize display after {self.max_init_retries} attempts")
-        
-        # Fall back to mock mode if hardware initialization failed
-        if not self.mock_mode:
-            logger.info("Falling back to mock display mode after hardware initialization failure")
-            self.mock_mode = True
-            return self._initialize_display()
-            
+        logger.error("Failed to initialize display after %s attempts", self.max_init_retries)
         return False
 
+    @staticmethod
+    def _is_transient_init_error(error) -> bool:
+        """
+        Check whether a failed display initialization is worth retrying
+        
+        A missing module, device node or permission will still be missing on
+        the next attempt; anything else (a GPIO line still held by another
+        process, a busy timeout) may clear up.
+        """
+        return not isinstance(error, (ImportError, FileNotFoundError, PermissionError, NotImplementedError))
+
     def _handle_refresh(self, operation=None):
         """
         Handle refresh logic for display operations
@@ -1486,19 +2128,19 @@ def run_service(debug_timeout=None):
     if debug_timeout is not None and isinstance(debug_timeout, str):
         try:
             debug_timeout = int(debug_timeout)
-            logger.info(f"Converted timeout string to int: {debug_timeout}")
+            logger.info("Converted timeout string to int: %s", debug_timeout)
         except ValueError:
-            logger.error(f"Invalid timeout value: {debug_timeout}, using default")
+            logger.error("Invalid timeout value: %s, using default", debug_timeout)
             debug_timeout = 30
     
-    logger.info(f"Debug timeout set to: {debug_timeout}")
+    logger.info("Debug timeout set to: %s", debug_timeout)
     
     # If debug_timeout is set, create a timeout watchdog thread
     if debug_timeout:
         def timeout_watchdog():
             # Give plenty of time for the main loop to handle the timeout
             watchdog_sleep = debug_timeout + 10  # Give a 10-second grace period
-            logger.info(f"Timeout watchdog started: will force exit after {watchdog_sleep} seconds")
+            logger.info("Timeout watchdog started: will force exit after %s seconds", watchdog_sleep)
             time.sleep(watchdog_sleep)
             logger.critical("WATCHDOG TIMEOUT: Forcing process termination!")
             # Force process to exit
@@ -1507,28 +2149,13 @@ def run_service(debug_timeout=None):
         # Start watchdog in daemon thread
         watchdog_thread = threading.Thread(target=timeout_watchdog, daemon=True)
         watchdog_thread.start()
-        logger.info(f"Started timeout watchdog thread to enforce {debug_timeout}s timeout")
+        logger.info("Started timeout watchdog thread to enforce %ss timeout", debug_timeout)
     
     # Create and start service
+    service = None
     try:
-        # Set up signal handlers to capture termination signals
-        def handle_termination(signum, frame):
-            logger.info(f"Received signal {signum}, shutting down EInk service")
-            # If service exists, stop it gracefully
-            if 'service' in locals() and hasattr(service, 'stop'):
-                try:
-                    service.stop()
-                except Exception as e:
-                    logger.error(f"Error stopping service: {e}")
-            # Exit the process
-            logger.info("Exiting process after signal")
-            os._exit(0)
-            
-        # Register signal handlers
-        signal.signal(signal.SIGINT, handle_termination)
-        signal.signal(signal.SIGTERM, handle_termination)
-        
-        # Create and start the service
+        # start() installs SIGINT/SIGTERM/SIGHUP handlers that set the stop
+        # event; the wait below then returns and the finally block stops it
         service = EInkService()
         logger.info("Starting EInk service...")
         if not service.start():
@@ -1537,92 +2164,78 @@ def run_service(debug_timeout=None):
         
         # If debug_timeout is set, print a message about it
         if debug_timeout:
-            logger.info(f"Debug mode: Service will automatically exit after {debug_timeout} seconds")
+            logger.info("Debug mode: Service will automatically exit after %s seconds", debug_timeout)
             # Set an absolute end time for more precise timing
             end_time = start_time + debug_timeout
-            logger.info(f"End time set to: {end_time} (current time: {start_time})")
+            logger.info("End time set to: %s (current time: %s)", end_time, start_time)
         
         # Add this helper function to test socket connectivity
         def verify_socket_file(socket_path):
             """Verify that the socket file exists and has correct permissions"""
-            if not os.path.exists(socket_path):
-                logger.error(f"Socket file not found at {socket_path}")
-                return False
-                
             try:
                 # Check socket file permissions
                 statinfo = os.stat(socket_path)
-                logger.info(f"Socket file stats: mode={oct(statinfo.st_mode)}, uid={statinfo.st_uid}, gid={statinfo.st_gid}")
+                logger.info("Socket file stats: mode=%s, uid=%s, gid=%s", oct(statinfo.st_mode), statinfo.st_uid, statinfo.st_gid)
                 
                 # Check if file is actually a socket
                 is_socket = stat.S_ISSOCK(statinfo.st_mode)
                 if not is_socket:
-                    logger.error(f"File at {socket_path} is not a socket (mode={oct(statinfo.st_mode)})")
+                    logger.error("File at %s is not a socket (mode=%s)", socket_path, oct(statinfo.st_mode))
                     return False
                     
                 return True
+            except FileNotFoundError:
+                logger.error("Socket file not found at %s, service is not operational", socket_path)
+                return False
             except Exception as e:
-                logger.error(f"Error checking socket file: {e}")
+                logger.error("Error checking socket file: %s", e)
                 return False
         
         # Check for socket file but don't actively test connections
-        if 'service' in locals() and hasattr(service, 'initialized') and service.initialized:
+        if service.initialized:
             socket_path = service.socket_path
-            if os.path.exists(socket_path):
-                logger.info(f"Socket file exists at {socket_path}")
-                socket_ok = verify_socket_file(socket_path)
-                if socket_ok:
-                    logger.info("Socket file verified, service should be operational")
-                else:
-                    logger.warning("Socket file exists but verification failed, service may not be fully operational")
+            if verify_socket_file(socket_path):
+                logger.info("Socket file verified, service should be operational")
             else:
-                logger.error(f"Socket file not found at {socket_path}, service is not operational")
+                logger.warning("Socket file verification failed, service may not be fully operational")
         
         # Main service loop - wait for timeout or termination
         if debug_timeout:
-            logger.info(f"Entering main loop, will exit after {debug_timeout} seconds")
+            logger.info("Entering main loop, will exit after %s seconds", debug_timeout)
             try:
-                # Wait until the end time or until service is no longer initialized
-                while time.time() < end_time and 'service' in locals() and service.initialized:
-                    # Sleep for a short time to prevent CPU hogging
-                    time.sleep(0.1)
-                
-                # Log the reason for exiting the loop
-                if time.time() >= end_time:
-                    logger.info(f"Debug timeout of {debug_timeout} seconds reached, exiting")
-                elif not service.initialized:
-                    logger.info("Service is no longer initialized, exiting")
+                # Block until the service stops or the end time is reached
+                if service.stop_event.wait(timeout=max(0, end_time - time.time())):
+                    logger.info("Service stopped, exiting")
                 else:
-                    logger.info("Exiting main loop for unknown reason")
+                    logger.info("Debug timeout of %s seconds reached, exiting", debug_timeout)
             except KeyboardInterrupt:
                 logger.info("Keyboard interrupt received in main loop, shutting down")
         else:
             logger.info("No timeout set, service will run until manually terminated")
-            # In non-debug mode, we would normally block here indefinitely
-            # But since we're using a separate thread for command processing,
-            # we can just return and let the process continue running
+            # Block without polling until stop() sets the stop event
+            service.stop_event.wait()
+            logger.info("Service stopped, exiting")
     
     except KeyboardInterrupt:
         logger.info("Keyboard interrupt received, shutting down")
     except Exception as e:
-        logger.error(f"Error running EInk service: {e}")
-        logger.error(traceback.format_exc())
+        logger.exception("Error running EInk service: %s", e)
     finally:
         # Record exit time
         exit_time = time.time()
         runtime = exit_time - start_time
         
         # Always clean up hardware resources on exit
-        if 'service' in locals() and hasattr(service, 'initialized') and service.initialized:
+        if service is not None and service.initialized:
             logger.info("Shutting down EInk service")
             try:
                 service.stop()
                 logger.info("EInk service stopped successfully")
             except Exception as e:
-                logger.error(f"Error stopping service during cleanup: {e}")
+                logger.error("Error stopping service during cleanup: %s", e)
         
         # Log the total runtime
-        logger.info(f"EInk service has been terminated after running for {int(runtime)}s")
+        logger.info("EInk service has been terminated after running for %ss", int(runtime))
         
         # Force exit to ensure process termination - with a small delay to allow logging
         logger.info("Forcing process exit now")
@@ -1631,35 +2244,35 @@ def run_service(debug_timeout=None):
 
 
 if __name__ == "__main__":
-    # Check for command line arguments for debug mode
-    debug_timeout = None
-    verbose = False
+    parser = argparse.ArgumentParser(description="Run the EInk service")
+    parser.add_argument('--timeout', type=int, help="Exit after this many seconds")
+    parser.add_argument('--debug', action='store_true',
+                        help="Exit after 30 seconds unless --timeout is given")
+    parser.add_argument('--verbose', action='store_true', help="Log at DEBUG level")
+    # Also passed by scripts.start_eink_service when it runs this module
+    parser.add_argument('--mock', action='store_true', help="Run in mock mode without hardware")
+    parser.add_argument('--socket-path', help="Path to the Unix socket file")
+    args = parser.parse_args()
     
-    # Process command line arguments
-    for i, arg in enumerate(sys.argv[1:]):
-        if arg == '--debug':
-            # If no timeout is specified with --debug, use a default
-            if debug_timeout is None:
-                debug_timeout = 30
-                print(f"Debug mode: Service will exit after {debug_timeout} seconds (default)")
-        elif arg.startswith('--timeout='):
-            try:
-                debug_timeout = int(arg.split('=')[1])
-                print(f"Debug mode: Service will exit after {debug_timeout} seconds")
-            except (IndexError, ValueError) as e:
-                print(f"Invalid timeout value: {arg}, using default of 30 seconds")
-                debug_timeout = 30
-        elif arg == '--verbose':
-            verbose = True
-            print("Verbose mode enabled")
-            # Set logging level to DEBUG
-            for handler in logger.handlers:
-                handler.setLevel(logging.DEBUG)
-            logger.setLevel(logging.DEBUG)
+    debug_timeout = args.timeout
+    if debug_timeout is None and args.debug:
+        debug_timeout = 30
+    if debug_timeout is not None:
+        print(f"Debug mode: Service will exit after {debug_timeout} seconds")
+    if args.verbose:
+        print("Verbose mode enabled")
+        # Set logging level to DEBUG
+        for handler in logger.handlers:
+            handler.setLevel(logging.DEBUG)
+        logger.setLevel(logging.DEBUG)
+    if args.mock:
+        os.environ['EINK_MOCK_MODE'] = '1'
+    if args.socket_path:
+        os.environ['EINK_SOCKET_PATH'] = args.socket_path
     
     # Log the final timeout value
     if debug_timeout is not None:
-        logger.info(f"Debug mode enabled with timeout of {debug_timeout} seconds")
+        logger.info("Debug mode enabled with timeout of %s seconds", debug_timeout)
     
     # Run with the timeout if specified
-    run_service(debug_timeout) 
\ No newline at end of file
+    run_service(debug_timeout)
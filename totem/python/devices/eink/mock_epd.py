@@ -45,7 +45,8 @@ class MockEPD:
         print(f"Mock EPD: Displaying image of size {image.width}x{image.height}")
         time.sleep(0.5)  # Simulate display delay
     
-    def display_text(self, text, x=10, y=10, font_size=24):
+    def display_text(self, text, x=10, y=10, font_size=24, text_color="black", background_color="white",
+                     fast_refresh=False):
         """Display text on the mock display"""
         if not self.initialized:
             self.init()
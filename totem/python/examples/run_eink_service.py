@@ -11,7 +11,6 @@ Usage:
 
 import os
 import sys
-import time
 import signal
 import argparse
 import logging
@@ -111,10 +110,9 @@ def main():
         print("E-Ink service started successfully. Ctrl+C to stop.")
         print(f"Unix socket: {args.socket_path}")
         
-        # Keep the script running
+        # Keep the script running until the service is stopped
         try:
-            while not service.stop_event.is_set():
-                time.sleep(1)
+            service.stop_event.wait()
         except KeyboardInterrupt:
             print("\nKeyboard interrupt received. Shutting down...")
         finally:
@@ -3,9 +3,23 @@ from devices.eink.eink_client import EInkClient
 from PIL import Image, ImageDraw, ImageFont
 from utils.logger import logger
 from typing import Optional
+import functools
 import os
 import io
 
+
+@functools.lru_cache(maxsize=32)
+def _load_font(font_name, font_size):
+    """Load a font once per (font_name, font_size), falling back to PIL's default font"""
+    try:
+        if font_name:
+            return ImageFont.truetype(font_name, font_size)
+        return ImageFont.load_default()
+    except Exception as e:
+        logger.warning(f"Could not load font, using default: {e}")
+        return ImageFont.load_default()
+
+
 class DisplayManager:
     """
     Manager for interacting with the e-ink display
@@ -64,7 +78,7 @@ class DisplayManager:
             if self.use_service:
                 # Use the EInk service
                 response = self.eink_client.clear_screen()
-                if response.get('status') != 'queued':
+                if response.get('status') == 'error':
                     logger.error(f"Failed to clear screen via service: {response.get('message', 'Unknown error')}")
                     raise Exception(f"Service error: {response.get('message', 'Unknown error')}")
             else:
@@ -96,7 +110,7 @@ class DisplayManager:
             if self.use_service:
                 # Use the EInk service
                 response = self.eink_client.display_text(text, font_size=font_size, x=x, y=y, font=font_name)
-                if response.get('status') != 'queued':
+                if response.get('status') == 'error':
                     logger.error(f"Failed to display text via service: {response.get('message', 'Unknown error')}")
                     raise Exception(f"Service error: {response.get('message', 'Unknown error')}")
             else:
@@ -117,15 +131,8 @@ class DisplayManager:
                     
                 draw = ImageDraw.Draw(image)
                 
-                # Load font
-                try:
-                    if font_name:
-                        font = ImageFont.truetype(font_name, font_size)
-                    else:
-                        font = ImageFont.load_default()
-                except Exception as e:
-                    logger.warning(f"Could not load font, using default: {e}")
-                    font = ImageFont.load_default()
+                # Load font (cached, parsing a TrueType file takes tens of ms)
+                font = _load_font(font_name, font_size)
                 
                 draw.text((x, y), text, font=font, fill=0)
                 
@@ -154,7 +161,7 @@ class DisplayManager:
             if self.use_service:
                 # Use the EInk service
                 response = self.eink_client.display_image(image_path=file_path)
-                if response.get('status') != 'queued':
+                if response.get('status') == 'error':
                     logger.error(f"Failed to display image via service: {response.get('message', 'Unknown error')}")
                     raise Exception(f"Service error: {response.get('message', 'Unknown error')}")
             else:
@@ -186,7 +193,7 @@ class DisplayManager:
             if self.use_service:
                 # Use the EInk service
                 response = self.eink_client.display_image(image=image)
-                if response.get('status') != 'queued':
+                if response.get('status') == 'error':
                     logger.error(f"Failed to display image via service: {response.get('message', 'Unknown error')}")
                     raise Exception(f"Service error: {response.get('message', 'Unknown error')}")
             else:
@@ -217,7 +224,7 @@ class DisplayManager:
                 # Convert bytes to image and use the service
                 image = Image.open(io.BytesIO(image_bytes))
                 response = self.eink_client.display_image(image=image)
-                if response.get('status') != 'queued':
+                if response.get('status') == 'error':
                     logger.error(f"Failed to display image bytes via service: {response.get('message', 'Unknown error')}")
                     raise Exception(f"Service error: {response.get('message', 'Unknown error')}")
             else:
@@ -235,7 +242,7 @@ class DisplayManager:
             if self.use_service:
                 # Use the EInk service
                 response = self.eink_client.sleep_display()
-                if response.get('status') != 'queued':
+                if response.get('status') == 'error':
                     logger.error(f"Failed to sleep display via service: {response.get('message', 'Unknown error')}")
                     raise Exception(f"Service error: {response.get('message', 'Unknown error')}")
             else:
@@ -256,7 +263,7 @@ class DisplayManager:
             if self.use_service:
                 # Use the EInk service
                 response = self.eink_client.wake_display()
-                if response.get('status') != 'queued':
+                if response.get('status') == 'error':
                     logger.error(f"Failed to wake display via service: {response.get('message', 'Unknown error')}")
                     raise Exception(f"Service error: {response.get('message', 'Unknown error')}")
             else:
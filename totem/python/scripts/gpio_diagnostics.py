@@ -234,9 +234,12 @@ def diagnose_and_fix():
     
     # 5. Check for processes using GPIO
     try:
-        result = subprocess.run(["sudo", "lsof", "/dev/gpiochip0"], capture_output=True, text=True)
-        if result.returncode == 0 and len(result.stdout.strip()) > 0:
-            processes = result.stdout.count('\n') - 1  # Subtract header line
+        # Field output (-F p) prints one "p<pid>" line per process, so there is
+        # no header or column layout to parse and a process holding several
+        # descriptors is only counted once
+        result = subprocess.run(["sudo", "lsof", "-F", "p", "/dev/gpiochip0"], capture_output=True, text=True)
+        if result.returncode == 0:
+            processes = sum(1 for line in result.stdout.splitlines() if line.startswith('p'))
             if processes > 1:  # More than one process is using GPIO
                 issues.append(f"Multiple processes ({processes}) are using GPIO, which may cause conflicts")
     except Exception:
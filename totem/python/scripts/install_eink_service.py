@@ -29,6 +29,8 @@ WorkingDirectory={work_dir}
 ExecStart={python_path} {service_script}
 Environment="EINK_DISPLAY_TYPE={driver_name}"
 Environment="EINK_USE_TCP={use_tcp}"
+# Lets the display thread run with SCHED_FIFO when EINK_RT=1 is set
+AmbientCapabilities=CAP_SYS_NICE
 Restart=always
 RestartSec=5
 
@@ -123,8 +125,10 @@ def uninstall_service():
         
         # Remove the service file
         service_file = "/etc/systemd/system/eink.service"
-        if os.path.exists(service_file):
+        try:
             os.unlink(service_file)
+        except FileNotFoundError:
+            pass
         
         # Reload systemd daemon
         subprocess.check_call(["systemctl", "daemon-reload"])
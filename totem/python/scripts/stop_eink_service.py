@@ -64,23 +64,24 @@ def stop_eink_service():
         
         # Remove the socket file if it exists
         socket_path = '/tmp/eink_service.sock'
-        if os.path.exists(socket_path):
+        try:
+            os.unlink(socket_path)
+            print(f"Removed socket file: {socket_path}")
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            print(f"Failed to remove socket file: {e}")
+            # Try with sudo
             try:
-                os.unlink(socket_path)
-                print(f"Removed socket file: {socket_path}")
-            except Exception as e:
-                print(f"Failed to remove socket file: {e}")
-                # Try with sudo
-                try:
-                    subprocess.run(
-                        ['sudo', 'rm', socket_path],
-                        stdout=subprocess.PIPE,
-                        stderr=subprocess.PIPE,
-                        check=True
-                    )
-                    print(f"Removed socket file with sudo: {socket_path}")
-                except subprocess.CalledProcessError as e:
-                    print(f"Failed to remove socket file with sudo: {e}")
+                subprocess.run(
+                    ['sudo', 'rm', socket_path],
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.PIPE,
+                    check=True
+                )
+                print(f"Removed socket file with sudo: {socket_path}")
+            except subprocess.CalledProcessError as e:
+                print(f"Failed to remove socket file with sudo: {e}")
         
         # Verify that the service is stopped
         time.sleep(1)
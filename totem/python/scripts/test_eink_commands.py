@@ -113,15 +113,13 @@ def run_test_commands(client):
         logger.info("Checking service status...")
         result = client.get_status()
         logger.info(f"Status: {json.dumps(result, indent=2)}")
-        # For now, even a 'queued' status is considered a success since there's an issue with 
-        # the EInk service responding back with actual results
-        all_success = all_success and (result.get('status') == 'success' or result.get('status') == 'queued')
+        all_success = all_success and result.get('status') == 'success'
         
         # Clear the screen
         logger.info("Clearing screen...")
         result = client.clear_screen()
         logger.info(f"Clear result: {json.dumps(result, indent=2)}")
-        all_success = all_success and (result.get('status') == 'success' or result.get('status') == 'queued')
+        all_success = all_success and result.get('status') == 'success'
         
         # Display text
         logger.info("Displaying text...")
@@ -132,7 +130,7 @@ def run_test_commands(client):
             font_size=24
         )
         logger.info(f"Display text result: {json.dumps(result, indent=2)}")
-        all_success = all_success and (result.get('status') == 'success' or result.get('status') == 'queued')
+        all_success = all_success and result.get('status') == 'success'
         
         # Short delay to let the display update
         time.sleep(2)
@@ -141,7 +139,7 @@ def run_test_commands(client):
         logger.info("Putting display to sleep...")
         result = client.sleep()
         logger.info(f"Sleep result: {json.dumps(result, indent=2)}")
-        all_success = all_success and (result.get('status') == 'success' or result.get('status') == 'queued')
+        all_success = all_success and result.get('status') == 'success'
         
         # Short delay
         time.sleep(1)
@@ -150,7 +148,7 @@ def run_test_commands(client):
         logger.info("Waking display...")
         result = client.wake()
         logger.info(f"Wake result: {json.dumps(result, indent=2)}")
-        all_success = all_success and (result.get('status') == 'success' or result.get('status') == 'queued')
+        all_success = all_success and result.get('status') == 'success'
         
         return all_success
         
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+Tests for the EInk wire protocol helpers
+These run without a display or a running service
+"""
+
+import os
+import sys
+
+import pytest
+
+# Add the parent directory to the path to import from the project
+script_dir = os.path.dirname(os.path.abspath(__file__))
+python_dir = os.path.dirname(os.path.dirname(script_dir))
+sys.path.insert(0, python_dir)
+
+from devices.eink import eink_protocol
+from devices.eink.eink_protocol import (
+    FRAME_HEADER, IMAGE_HEADER, MAX_FRAME_SIZE, MSG_COMMAND, MSG_IMAGE, MSG_JSON,
+    RESERVED_MSG_TYPES, decode_command_payload, decode_image_payload, encode_command_frame,
+    encode_frame, encode_image_frame, is_legacy_message, json_dumps, split_frame
+)
+
+
+def test_frame_round_trip():
+    payload = json_dumps({'action': 'status'})
+    frame = encode_frame(payload)
+    msg_type, data, end = split_frame(frame)
+    assert msg_type == MSG_JSON
+    assert bytes(data) == payload
+    assert end == len(frame)
+
+
+def test_split_frame_back_to_back():
+    buf = encode_frame(b'first') + encode_frame(b'second', MSG_COMMAND)
+    msg_type, data, end = split_frame(buf)
+    assert (msg_type, bytes(data)) == (MSG_JSON, b'first')
+    msg_type, data, rest = split_frame(memoryview(buf)[end:])
+    assert (msg_type, bytes(data)) == (MSG_COMMAND, b'second')
+    assert end + rest == len(buf)
+
+
+@pytest.mark.parametrize('size', [0, 1, FRAME_HEADER.size - 1, FRAME_HEADER.size, FRAME_HEADER.size + 3])
+def test_split_frame_partial(size):
+    frame = encode_frame(b'payload')
+    assert split_frame(frame[:size]) is None
+
+
+def test_split_frame_empty_payload():
+    assert split_frame(encode_frame(b''))[2] == FRAME_HEADER.size
+
+
+def test_split_frame_size_limit():
+    header = FRAME_HEADER.pack(MSG_JSON, MAX_FRAME_SIZE)
+    # Within the limit: waits for the rest of the payload
+    assert split_frame(header) is None
+    with pytest.raises(ValueError):
+        split_frame(FRAME_HEADER.pack(MSG_JSON, MAX_FRAME_SIZE + 1))
+
+
+@pytest.mark.parametrize('msg_type', sorted(RESERVED_MSG_TYPES))
+def test_encode_frame_rejects_reserved_types(msg_type):
+    with pytest.raises(ValueError):
+        encode_frame(b'', msg_type)
+
+
+def test_image_payload_round_trip():
+    header = {'action': 'display_image', 'mode': '1', 'width': 8, 'height': 2}
+    frame = encode_image_frame(header, b'\xff\x00')
+    msg_type, data, _ = split_frame(frame)
+    assert msg_type == MSG_IMAGE
+    decoded, image_bytes = decode_image_payload(data)
+    assert decoded == header
+    assert bytes(image_bytes) == b'\xff\x00'
+
+
+@pytest.mark.parametrize('payload', [
+    b'',
+    b'\x00\x00',
+    IMAGE_HEADER.pack(3) + b'{}',
+    IMAGE_HEADER.pack(0xFFFFFFFF),
+])
+def test_image_payload_bad_header_size(payload):
+    with pytest.raises(ValueError):
+        decode_image_payload(payload)
+
+
+@pytest.mark.parametrize('command', [
+    {'action': 'status'},
+    {'action': 'clear'},
+    {'action': 'sleep'},
+    {'action': 'wake'},
+    {'action': 'display_text', 'text': 'Hello, wörld', 'x': 5, 'y': 300, 'font_size': 48},
+    {'action': 'display_text', 'text': '', 'x': 0, 'y': 0, 'font_size': 0xFFFF},
+])
+def test_command_round_trip(command):
+    msg_type, data, _ = split_frame(encode_command_frame(command))
+    assert msg_type == MSG_COMMAND
+    assert decode_command_payload(data) == command
+
+
+def test_command_frame_fills_text_defaults():
+    frame = encode_command_frame({'action': 'display_text', 'text': 'hi', 'text_color': 'black'})
+    assert decode_command_payload(split_frame(frame)[1]) == {
+        'action': 'display_text', 'text': 'hi', 'x': 10, 'y': 10, 'font_size': 24,
+    }
+
+
+@pytest.mark.parametrize('command', [
+    {'action': 'display_image'},
+    {'action': 'status', 'extra': 1},
+    {'action': 'display_text', 'text': 'hi', 'x': -1},
+    {'action': 'display_text', 'text': 'hi', 'font_size': 0x10000},
+    {'action': 'display_text', 'text': 'hi', 'text_color': 'red'},
+    {'action': 'display_text', 'text': 'hi', 'fast_refresh': True},
+])
+def test_command_frame_falls_back_to_json(command):
+    assert encode_command_frame(command) is None
+
+
+@pytest.mark.parametrize('payload', [b'', b'\x00', b'\xff', b'\x05\x00\x01'])
+def test_command_payload_invalid(payload):
+    with pytest.raises(ValueError):
+        decode_command_payload(payload)
+
+
+@pytest.mark.parametrize('data, expected', [
+    (b'{"action": "status"}', True),
+    (b'\n  {"action": "status"}', True),
+    (b'[1, 2]', True),
+    (b' "text"', True),
+    (encode_frame(b'{}'), False),
+    (encode_command_frame({'action': 'status'}), False),
+    # A reserved whitespace type is followed by the length, not by JSON
+    (FRAME_HEADER.pack(9, 2) + b'xx', False),
+    (FRAME_HEADER.pack(13, 2) + b'xx', False),
+    (b'', None),
+    (b' \t\r\n', None),
+])
+def test_is_legacy_message(data, expected):
+    assert is_legacy_message(data) is expected
+
+
+@pytest.mark.parametrize('use_orjson', [False, True])
+def test_json_dumps_sort_keys(monkeypatch, use_orjson):
+    if use_orjson and not eink_protocol.HAS_ORJSON:
+        pytest.skip("orjson is not installed")
+    monkeypatch.setattr(eink_protocol, 'HAS_ORJSON', use_orjson)
+    assert json_dumps({'b': 1, 'a': {'d': 2, 'c': 3}}, sort_keys=True) == b'{"a":{"c":3,"d":2},"b":1}'
+    assert json_dumps({'b': 1, 'a': 2}) == b'{"b":1,"a":2}'
@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+"""
+Tests for the EInk service's command handling
+These run without a display: commands are checked and executed against a
+stand-in display, without starting the socket server
+"""
+
+import os
+import selectors
+import socket
+import sys
+
+import pytest
+
+# Add the parent directory to the path to import from the project
+script_dir = os.path.dirname(os.path.abspath(__file__))
+python_dir = os.path.dirname(os.path.dirname(script_dir))
+sys.path.insert(0, python_dir)
+
+from devices.eink import eink_service
+from devices.eink.eink_protocol import MAX_FRAME_SIZE, decode_command_payload, encode_command_frame, split_frame
+
+
+class RecordingDisplay:
+    """Stand-in display that records the calls the service makes"""
+    
+    def __init__(self, fail_text=False):
+        self.calls = []
+        self.fail_text = fail_text
+    
+    def Clear(self):
+        self.calls.append('Clear')
+    
+    def display_text(self, text, x, y, font_size, text_color, background_color, fast_refresh=False):
+        if self.fail_text:
+            raise RuntimeError("display_text failed")
+        self.calls.append(('display_text', text, fast_refresh))
+
+
+@pytest.fixture
+def image_dir(tmp_path):
+    directory = tmp_path / 'images'
+    directory.mkdir()
+    return directory
+
+
+@pytest.fixture
+def service(monkeypatch, image_dir):
+    monkeypatch.setenv('EINK_IMAGE_DIRS', str(image_dir))
+    service = eink_service.EInkService()
+    yield service
+    service._display_exec.shutdown()
+    service._waker.close()
+
+
+@pytest.fixture
+def display(service):
+    display = RecordingDisplay()
+    service.display = display
+    service._display_ready()
+    return display
+
+
+def run_batch(service, batch):
+    """Execute a batch on the calling thread and return the results in order"""
+    service._execute_batch(batch)
+    results = list(service._finished)
+    service._finished.clear()
+    return results
+
+
+def text(message, **fields):
+    return dict({'action': 'display_text', 'text': message}, **fields)
+
+
+def test_clear_folded_into_full_redraw(service, display):
+    conn = object()
+    results = run_batch(service, [(conn, {'action': 'clear'}), (conn, text('hello'))])
+    assert display.calls == [('display_text', 'hello', False)]
+    assert [result for _, result in results] == [
+        eink_service._RESPONSE_CLEARED, {'status': 'success', 'message': 'Displayed text: hello'},
+    ]
+
+
+def test_clear_runs_before_fast_refresh(service, display):
+    conn = object()
+    run_batch(service, [(conn, {'action': 'clear'}), (conn, text('hello', fast_refresh=True))])
+    assert display.calls == ['Clear', ('display_text', 'hello', True)]
+
+
+def test_clear_runs_when_redraw_fails(service, display):
+    display.fail_text = True
+    conn = object()
+    results = run_batch(service, [(conn, {'action': 'clear'}), (conn, text('hello'))])
+    assert display.calls == ['Clear']
+    assert results[0][1] is eink_service._RESPONSE_CLEARED
+    assert results[1][1]['status'] == 'error'
+
+
+def test_clear_not_folded_across_clients(service, display):
+    run_batch(service, [(object(), {'action': 'clear'}), (object(), text('hello'))])
+    assert display.calls == ['Clear', ('display_text', 'hello', False)]
+
+
+def test_clear_not_folded_into_later_redraw(service, display):
+    conn = object()
+    run_batch(service, [(conn, {'action': 'clear'}), (conn, {'action': 'status'}), (conn, text('hello'))])
+    assert display.calls == ['Clear', ('display_text', 'hello', False)]
+
+
+def test_folded_redraw_skips_content_cache(service, display):
+    conn = object()
+    run_batch(service, [(conn, text('hello'))])
+    run_batch(service, [(conn, {'action': 'clear'}), (conn, text('hello'))])
+    assert display.calls == [('display_text', 'hello', False)] * 2
+
+
+def test_repeated_draw_is_cached(service, display):
+    conn = object()
+    results = run_batch(service, [(conn, text('hello')), (conn, text('hello')), (conn, text('changed'))])
+    assert display.calls == [('display_text', 'hello', False), ('display_text', 'changed', False)]
+    assert [result is eink_service._RESPONSE_UNCHANGED for _, result in results] == [False, True, False]
+
+
+def test_cache_ignores_field_order_and_encoding(service, display):
+    conn = object()
+    as_json = text('hello', x=10, y=20, font_size=24, text_color='black', background_color='white')
+    reordered = dict(reversed(list(as_json.items())))
+    compact = decode_command_payload(split_frame(encode_command_frame(as_json))[1])
+    results = run_batch(service, [(conn, as_json), (conn, reordered), (conn, compact)])
+    assert display.calls == [('display_text', 'hello', False)]
+    assert [result is eink_service._RESPONSE_UNCHANGED for _, result in results] == [False, True, True]
+
+
+def test_cache_forgotten_after_clear(service, display):
+    conn = object()
+    run_batch(service, [(conn, text('hello'))])
+    run_batch(service, [(conn, {'action': 'clear'})])
+    results = run_batch(service, [(conn, text('hello'))])
+    assert display.calls == [('display_text', 'hello', False), 'Clear', ('display_text', 'hello', False)]
+    assert results[0][1] is not eink_service._RESPONSE_UNCHANGED
+
+
+@pytest.fixture
+def client_pair(service):
+    """A connection registered with the service and the client's end of it"""
+    service._selector = selectors.DefaultSelector()
+    server_sock, client_sock = socket.socketpair()
+    server_sock.setblocking(False)
+    conn = eink_service._Connection(server_sock, 'test')
+    conn.framed = True
+    service._connections.add(conn)
+    service._selector.register(server_sock, selectors.EVENT_READ, conn)
+    yield conn, client_sock
+    client_sock.close()
+    server_sock.close()
+    service._selector.close()
+
+
+def test_send_error_closes_connection(service, client_pair):
+    conn, client_sock = client_pair
+    client_sock.close()
+    service._send_responses(conn, [eink_service._RESPONSE_CLEARED], conn.framed)
+    assert conn.closed
+    assert conn not in service._connections
+    assert conn.sock not in [key.fileobj for key in service._selector.get_map().values()]
+
+
+def test_close_connection_after_half_close(service, client_pair):
+    conn, client_sock = client_pair
+    client_sock.shutdown(socket.SHUT_WR)
+    # The service stops reading but still owes the client a reply
+    conn.replies.append(None)
+    service._handle_client(conn)
+    service._handle_client(conn)
+    assert not service._selector.get_map()
+    assert service._connections == {conn}
+    service._close_connection(conn)
+    assert conn.sock.fileno() == -1
+    assert not service._connections
+
+
+def test_read_image_file(service, image_dir):
+    (image_dir / 'logo.png').write_bytes(b'image data')
+    command = service._read_image_file({'action': 'display_file', 'path': str(image_dir / 'logo.png')})
+    assert command['action'] == 'display_image'
+    assert command['image_format'] == 'png'
+    assert bytes(command['image_bytes']) == b'image data'
+    assert 'path' not in command
+
+
+def test_read_image_file_outside_allowed_dirs(service, tmp_path):
+    (tmp_path / 'secret.png').write_bytes(b'image data')
+    with pytest.raises(ValueError):
+        service._read_image_file({'path': str(tmp_path / 'secret.png')})
+
+
+def test_read_image_file_parent_escape(service, image_dir, tmp_path):
+    (tmp_path / 'secret.png').write_bytes(b'image data')
+    with pytest.raises(ValueError):
+        service._read_image_file({'path': str(image_dir / '..' / 'secret.png')})
+
+
+def test_read_image_file_sibling_prefix(service, image_dir, tmp_path):
+    # 'images-other' starts with the allowed directory's name but is not inside it
+    sibling = tmp_path / (image_dir.name + '-other')
+    sibling.mkdir()
+    (sibling / 'logo.png').write_bytes(b'image data')
+    with pytest.raises(ValueError):
+        service._read_image_file({'path': str(sibling / 'logo.png')})
+
+
+def test_read_image_file_symlink_out(service, image_dir, tmp_path):
+    (tmp_path / 'secret.png').write_bytes(b'image data')
+    (image_dir / 'link.png').symlink_to(tmp_path / 'secret.png')
+    with pytest.raises(ValueError):
+        service._read_image_file({'path': str(image_dir / 'link.png')})
+
+
+def test_read_image_file_no_allowed_dirs(monkeypatch, tmp_path):
+    (tmp_path / 'logo.png').write_bytes(b'image data')
+    monkeypatch.delenv('EINK_IMAGE_DIRS', raising=False)
+    service = eink_service.EInkService()
+    try:
+        with pytest.raises(ValueError):
+            service._read_image_file({'path': str(tmp_path / 'logo.png')})
+    finally:
+        service._display_exec.shutdown()
+        service._waker.close()
+
+
+def test_read_image_file_fifo(service, image_dir):
+    # Must be rejected without waiting for a writer
+    os.mkfifo(image_dir / 'pipe.png')
+    with pytest.raises(ValueError):
+        service._read_image_file({'path': str(image_dir / 'pipe.png')})
+
+
+def test_read_image_file_directory(service, image_dir):
+    (image_dir / 'nested.png').mkdir()
+    with pytest.raises(ValueError):
+        service._read_image_file({'path': str(image_dir / 'nested.png')})
+
+
+def test_read_image_file_missing(service, image_dir):
+    with pytest.raises(OSError):
+        service._read_image_file({'path': str(image_dir / 'missing.png')})
+
+
+@pytest.mark.parametrize('size', [0, MAX_FRAME_SIZE + 1])
+def test_read_image_file_size_limits(service, image_dir, size):
+    path = image_dir / 'logo.png'
+    with open(path, 'wb') as f:
+        f.truncate(size)
+    with pytest.raises(ValueError):
+        service._read_image_file({'path': str(path)})
+
+
+def test_read_image_file_largest(service, image_dir):
+    path = image_dir / 'logo.png'
+    with open(path, 'wb') as f:
+        f.truncate(MAX_FRAME_SIZE)
+    command = service._read_image_file({'path': str(path)})
+    assert len(command['image_bytes']) == MAX_FRAME_SIZE